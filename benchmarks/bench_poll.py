@@ -0,0 +1,279 @@
+"""Benchmark the SolarMax Modbus poll hot path with recorded register frames.
+
+Runs SolarMaxModbusHub._async_update_data and async_determineInverterType
+against a fake Modbus client serving recorded frames, and fans the result
+out to the sensor set built by sensor.async_setup_entry.
+
+Reports the decode time of the read plans, the whole poll cycle,
+allocations and the entity fan-out (the entities' own coordinator update
+handler, change filter included) for 1, 10 and 100 hubs. Needs a Home
+Assistant development environment:
+
+    python benchmarks/bench_poll.py [--polls 200] [--hubs 1 10 100] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.solarmax_modbus import sensor as solarmax_sensor  # noqa: E402
+from custom_components.solarmax_modbus.const import DOMAIN, REGISTER_BASE_ADDRESS, SERIAL_NUMBER_ADDRESS  # noqa: E402
+from custom_components.solarmax_modbus.connection import ModbusConnection  # noqa: E402
+from custom_components.solarmax_modbus.hub import SolarMaxModbusHub  # noqa: E402
+
+ALLOC_POLLS = 20
+
+# 60 registers starting at 4097, recorded from a 6SMT at noon
+FRAME_ONGRID = [
+    2312, 871, 0, 20105, 5001,      # L1 voltage, current, power, frequency
+    2305, 866, 0, 19960, 5001,      # L2
+    2321, 874, 0, 20287, 5001,      # L3
+    3524, 880, 0, 31011,            # PV1 voltage, current, power
+    3498, 872, 0, 30502,            # PV2
+    0, 0, 0, 0,                     # PV3
+    41, 3,                          # temperature, inverter mode
+    0, 0, 0,                        # reserved
+    0, 23874, 0, 9125,              # total energy, total hours
+    0, 18, 0, 18342,                # today energy, today energy2
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,  # reserved
+    0, 60352, 0, 512, 0, 61020,     # active, reactive, today max power
+]
+
+# same inverter in the evening, standby
+FRAME_STANDBY = [
+    2318, 0, 0, 0, 5000,
+    2311, 0, 0, 0, 5000,
+    2326, 0, 0, 0, 5000,
+    612, 0, 0, 0,
+    588, 0, 0, 0,
+    0, 0, 0, 0,
+    23, 1,
+    0, 0, 0,
+    0, 23911, 0, 9137,
+    0, 37, 0, 37208,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 61020,
+]
+
+
+def _serial_frame(serial: str) -> list[int]:
+    """Encode a serial number the way the inverter stores it (2 ASCII chars per register)."""
+    raw = serial.encode("ascii").ljust(14, b"\0")
+    return [int.from_bytes(raw[i:i + 2], "big") for i in range(0, 14, 2)]
+
+
+FRAME_SERIAL = _serial_frame("2245-211303511")
+
+
+class FakeResponse:
+    """Minimal stand-in for a pymodbus register response."""
+
+    __slots__ = ("registers",)
+
+    def __init__(self, registers: list[int]) -> None:
+        self.registers = registers
+
+    def isError(self) -> bool:
+        return False
+
+
+class FakeClient:
+    """Serve recorded frames without any network I/O."""
+
+    def __init__(self, frames: list[list[int]]) -> None:
+        self.connected = True
+        self._frames = frames
+        self._next = 0
+        # registers served, to check that a timed poll read anything
+        self.registers_read = 0
+
+    async def connect(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self.connected = False
+
+    async def read_holding_registers(self, address: int, count: int = 1, **kwargs) -> FakeResponse:
+        if address == SERIAL_NUMBER_ADDRESS:
+            return FakeResponse(FRAME_SERIAL[:count])
+        frame = self._frames[self._next]
+        self._next = (self._next + 1) % len(self._frames)
+        offset = address - REGISTER_BASE_ADDRESS
+        self.registers_read += count
+        return FakeResponse(frame[offset:offset + count])
+
+
+def _register_fake_connection(hass: HomeAssistant, port: int) -> FakeClient:
+    """Register a ready connection with a fake client for the hub to pick up.
+
+    The connection task is never started, so nothing touches the network.
+    """
+    connection = ModbusConnection(hass, "127.0.0.1", port)
+    client = connection._client = FakeClient([FRAME_ONGRID, FRAME_STANDBY])
+    connection._ready.set()
+    hass.data[DOMAIN].setdefault("connections", {})[connection.key] = connection
+    return client
+
+
+async def _create_hubs(hass: HomeAssistant, count: int):
+    """Create count hubs with fake clients and their sensor entities."""
+    hubs = []
+    for i in range(count):
+        name = f"bench{i}"
+        _register_fake_connection(hass, 1502 + i)
+        hub = SolarMaxModbusHub(hass, name, "127.0.0.1", 1502 + i, 60, "")
+        entry = SimpleNamespace(entry_id=name, data={}, options={})
+        hass.data[DOMAIN][entry.entry_id] = {
+            "hub": hub,
+            "device_info": {"identifiers": {(DOMAIN, name)}, "name": name},
+        }
+        entities = []
+        await solarmax_sensor.async_setup_entry(hass, entry, entities.extend)
+        for entity in entities:
+            entity.hass = hass
+            entity.entity_id = f"sensor.{name}_{entity.entity_description.key.lower()}"
+            hub.enable_key(entity.entity_description.key)
+        hubs.append((hub, entities))
+    return hubs
+
+
+def _make_all_groups_due(hub: SolarMaxModbusHub) -> None:
+    """Make every poll group due, polls run back to back and not on the poll interval."""
+    hub._group_next_due.clear()
+
+
+def _decode(hub: SolarMaxModbusHub, frame: list[int]) -> None:
+    """Decode a frame with every block read the hub plans, without any I/O."""
+    for plans in hub._group_plans.values():
+        for plan in plans:
+            plan.decode(frame[plan.start:plan.start + plan.count])
+
+
+def _fan_out(entities) -> None:
+    """Run the coordinator update handler of every entity, writes only the states that changed."""
+    for entity in entities:
+        entity._handle_coordinator_update()
+
+
+def _summary(samples_ns: list[int]) -> dict[str, float]:
+    """Return mean/p50/p95/max in microseconds."""
+    samples = sorted(samples_ns)
+    return {
+        "mean_us": statistics.fmean(samples) / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p95_us": samples[int(len(samples) * 0.95) - 1] / 1000,
+        "max_us": samples[-1] / 1000,
+    }
+
+
+async def _bench(hass: HomeAssistant, hub_count: int, polls: int) -> dict:
+    """Benchmark one hub count."""
+    hubs = await _create_hubs(hass, hub_count)
+
+    ident_ns = []
+    for hub, _ in hubs:
+        start = time.perf_counter_ns()
+        await hub.async_determineInverterType()
+        ident_ns.append(time.perf_counter_ns() - start)
+
+    decode_ns = []
+    poll_ns = []
+    write_ns = []
+    round_ns = []
+    frames = [FRAME_ONGRID, FRAME_STANDBY]
+    for i in range(polls):
+        round_start = time.perf_counter_ns()
+        for hub, entities in hubs:
+            start = time.perf_counter_ns()
+            _decode(hub, frames[i % len(frames)])
+            decode_ns.append(time.perf_counter_ns() - start)
+
+            _make_all_groups_due(hub)
+            read_before = hub._connection._client.registers_read
+            start = time.perf_counter_ns()
+            hub.data = await hub._async_update_data()
+            poll_ns.append(time.perf_counter_ns() - start)
+            assert hub._connection._client.registers_read > read_before, "timed poll read no registers"
+
+            start = time.perf_counter_ns()
+            _fan_out(entities)
+            write_ns.append(time.perf_counter_ns() - start)
+        round_ns.append(time.perf_counter_ns() - round_start)
+
+    # allocations are measured in a separate pass, tracemalloc skews the timings
+    alloc_bytes = []
+    alloc_blocks = []
+    hub, _ = hubs[0]
+    tracemalloc.start()
+    for _ in range(min(polls, ALLOC_POLLS)):
+        _make_all_groups_due(hub)
+        before = tracemalloc.take_snapshot()
+        hub.data = await hub._async_update_data()
+        after = tracemalloc.take_snapshot()
+        diff = after.compare_to(before, "filename")
+        alloc_bytes.append(sum(max(d.size_diff, 0) for d in diff))
+        alloc_blocks.append(sum(max(d.count_diff, 0) for d in diff))
+    tracemalloc.stop()
+
+    for hub, _ in hubs:
+        hass.data[DOMAIN].pop(hub.name, None)
+        hub.close()
+
+    return {
+        "hubs": hub_count,
+        "entities_per_hub": len(hubs[0][1]),
+        "identify": _summary(ident_ns),
+        "decode": _summary(decode_ns),
+        "poll": _summary(poll_ns),
+        "fanout": _summary(write_ns),
+        "poll_round": _summary(round_ns),
+        "alloc_bytes_per_poll": statistics.fmean(alloc_bytes),
+        "alloc_blocks_per_poll": statistics.fmean(alloc_blocks),
+    }
+
+
+async def main(hub_counts: list[int], polls: int) -> list[dict]:
+    """Run the benchmark for every hub count."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.data.setdefault(DOMAIN, {})
+        results = [await _bench(hass, count, polls) for count in hub_counts]
+        await hass.async_stop(force=True)
+    return results
+
+
+def _print_table(results: list[dict]) -> None:
+    print(f"{'hubs':>5} {'entities':>8} {'decode p50':>11} {'decode p95':>11} {'poll p50':>10} "
+          f"{'fanout p50':>10} {'round p50':>10} {'alloc B':>8} {'blocks':>7} {'ident p50':>10}")
+    for r in results:
+        print(f"{r['hubs']:>5} {r['entities_per_hub']:>8} "
+              f"{r['decode']['p50_us']:>9.1f}us {r['decode']['p95_us']:>9.1f}us {r['poll']['p50_us']:>8.1f}us "
+              f"{r['fanout']['p50_us']:>8.1f}us {r['poll_round']['p50_us']:>8.0f}us "
+              f"{r['alloc_bytes_per_poll']:>8.0f} {r['alloc_blocks_per_poll']:>7.1f} "
+              f"{r['identify']['p50_us']:>8.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=200, help="poll rounds per hub count")
+    parser.add_argument("--hubs", type=int, nargs="+", default=[1, 10, 100], help="hub counts to run")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+    bench_results = asyncio.run(main(args.hubs, args.polls))
+    if args.json:
+        print(json.dumps(bench_results, indent=2))
+    else:
+        _print_table(bench_results)
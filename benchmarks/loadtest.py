@@ -0,0 +1,162 @@
+"""Load test: many SolarMaxModbusHub instances on one event loop.
+
+Starts the simulator from tools/simulator.py on localhost and polls it with
+N hubs inside a minimal Home Assistant instance. Reports event-loop lag,
+CPU time per poll, memory per hub and how spread out the poll completion
+times of one cycle are. The simulator shares the process unless --external
+is given (start tools/simulator.py with matching --gateways/--units then).
+Needs a Home Assistant development environment:
+
+    python benchmarks/loadtest.py --hubs 200 --gateways 20 --scan-interval 20 --duration 120
+
+--transport rtu_over_tcp runs the gateways as RTU bridges; with --baudrate
+the simulated bus time limits how many inverters fit on one gateway.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.solarmax_modbus.const import DOMAIN  # noqa: E402
+from custom_components.solarmax_modbus.hub import SolarMaxModbusHub  # noqa: E402
+from custom_components.solarmax_modbus.sensor import build_register_map  # noqa: E402
+from custom_components.solarmax_modbus.stagger import choose_phase  # noqa: E402
+from simulator import DayNight, Faults, start_simulator  # noqa: E402
+
+LAG_PROBE_INTERVAL = 0.05
+
+
+async def _probe_loop_lag(samples: list[float], stop: asyncio.Event) -> None:
+    """Measure how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        samples.append(loop.time() - start - LAG_PROBE_INTERVAL)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Return the pct percentile of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the load test."""
+    units_per_gateway = -(-args.hubs // args.gateways)
+    gateways = []
+    if not args.external:
+        gateways = await start_simulator(
+            args.host,
+            args.port,
+            args.gateways,
+            units_per_gateway,
+            Faults(args.latency, args.jitter, args.drop, args.error),
+            DayNight(),
+            rtu=args.transport == "rtu_over_tcp",
+            baudrate=args.baudrate,
+        )
+    descriptions, key_dict = build_register_map()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.data.setdefault(DOMAIN, {})
+        loop = asyncio.get_running_loop()
+
+        gc.collect()
+        tracemalloc.start()
+        mem_before = tracemalloc.get_traced_memory()[0]
+        hubs = []
+        completions: list[list[float]] = []
+        for index in range(args.hubs):
+            gateway, unit = divmod(index, units_per_gateway)
+            hub = SolarMaxModbusHub(
+                hass, f"load{index}", args.host, args.port + gateway, args.scan_interval, "",
+                unit_id=unit + 1, transport=args.transport, baudrate=args.baudrate or 115200,
+            )
+            if not args.no_stagger:
+                # what the integration does when the entries are set up one after another
+                hub.poll_phase = choose_phase([other.poll_phase for other in hubs])
+            hub.set_key_dict(key_dict)
+            for description in descriptions:
+                hub.enable_key(description.key)
+            done: list[float] = []
+            completions.append(done)
+            hub.async_add_listener(lambda done=done: done.append(loop.time()))
+            hubs.append(hub)
+        gc.collect()
+        mem_per_hub = (tracemalloc.get_traced_memory()[0] - mem_before) / args.hubs
+        tracemalloc.stop()
+
+        lag: list[float] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_loop_lag(lag, stop))
+        cpu_start = time.process_time()
+        wall_start = loop.time()
+        await asyncio.sleep(args.duration)
+        cpu_used = time.process_time() - cpu_start
+        stop.set()
+        await probe
+
+        for hub in hubs:
+            await hub.async_shutdown()
+            hub.close()
+        for gateway in gateways:
+            gateway.close()
+        await hass.async_stop(force=True)
+
+    polls = sum(len(done) for done in completions)
+    failed = sum(not hub.last_update_success for hub in hubs)
+    # spread of one cycle: time between the first and the last hub finishing poll number n
+    cycles = min(len(done) for done in completions)
+    spreads = [max(done[n] for done in completions) - min(done[n] for done in completions) for n in range(cycles)]
+    # where in the scan interval polls finish, a flat histogram means no synchronized bursts
+    buckets = [0] * 10
+    for done in completions:
+        for t in done:
+            buckets[int(((t - wall_start) % args.scan_interval) / args.scan_interval * 10)] += 1
+
+    print(f"hubs {args.hubs} on {args.gateways} gateway(s), scan interval {args.scan_interval}s, {args.duration}s run")
+    print(f"polls completed      {polls} ({polls / args.duration:.1f}/s), hubs failing at end {failed}")
+    print(f"cpu per poll         {cpu_used / max(polls, 1) * 1000:.3f} ms ({cpu_used / args.duration * 100:.1f}% of one core)")
+    print(f"memory per hub       {mem_per_hub / 1024:.1f} KiB")
+    bus_time = sum({id(hub._connection): hub._connection.bus.busy_time for hub in hubs}.values())
+    print(f"bus utilization      {bus_time / args.duration / args.gateways * 100:.1f}% per gateway")
+    print(f"loop lag             p50 {_percentile(lag, 50) * 1000:.2f} ms, p99 {_percentile(lag, 99) * 1000:.2f} ms, "
+          f"max {max(lag) * 1000:.2f} ms")
+    if spreads:
+        print(f"cycle spread         median {statistics.median(spreads):.3f} s, max {max(spreads):.3f} s over {cycles} cycles")
+    print(f"completion phase     {' '.join(f'{b:>5}' for b in buckets)}  (tenths of the scan interval)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--gateways", type=int, default=10, help="hubs are spread over this many simulated gateways")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020, help="port of the first simulated gateway")
+    parser.add_argument("--external", action="store_true", help="use an already running simulator")
+    parser.add_argument("--scan-interval", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=120, help="measurement time in seconds")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated gateway latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--error", type=float, default=0.0)
+    parser.add_argument("--no-stagger", action="store_true", help="all hubs poll at the same phase")
+    parser.add_argument("--transport", choices=["tcp", "rtu_over_tcp"], default="tcp")
+    parser.add_argument("--baudrate", type=int, default=0, help="simulated RS485 speed for rtu_over_tcp, 0 = unlimited")
+    asyncio.run(main(parser.parse_args()))
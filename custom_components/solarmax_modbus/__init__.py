@@ -8,11 +8,33 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.storage import Store
 from homeassistant.const import CONF_HOST, CONF_NAME, CONF_PORT, CONF_SCAN_INTERVAL
 
-from .const import DOMAIN, DEFAULT_PORT, DEFAULT_SCAN_INTERVAL, DEFAULT_FAST_POLL, ATTR_MANUFACTURER
+from .const import (
+    DOMAIN,
+    DEFAULT_PORT,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_FAST_POLL,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    CONF_FAST_POLL,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_UNIT_ID,
+    DEFAULT_UNIT_ID,
+    CONF_AGGREGATE_FAST,
+    DEFAULT_AGGREGATE_FAST,
+    ATTR_MANUFACTURER,
+    STORAGE_VERSION,
+    CONF_SERIAL_NUMBER,
+    CONF_MODEL,
+    CONF_TRANSPORT,
+    DEFAULT_TRANSPORT,
+    CONF_BAUDRATE,
+    DEFAULT_BAUDRATE,
+    CONF_POLL_PHASE,
+)
 from .hub import SolarMaxModbusHub
-from icmplib import SocketPermissionError, async_ping
+from .stagger import choose_phase, link_group
 
 _PLATFORMS: list[Platform] = [Platform.SENSOR]
 
@@ -25,7 +47,6 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the SolarMax Modbus component."""
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN]["icmp_privileged"] = await _can_use_icmp_lib_with_privilege()
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: New_NameConfigEntry) -> bool:
@@ -38,21 +59,45 @@ async def async_setup_entry(hass: HomeAssistant, entry: New_NameConfigEntry) ->
 
     hass.data[DOMAIN][entry.entry_id] = {
         "hub": hub,
-        "device_info": _create_device_info(entry)
+        "device_info": _create_device_info(entry, hub)
     }
 
-    # Start the main and fast coordinator scheduling
-    await hub.start_coordinator()
-
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
 
+    # Entities show the restored state until the first poll, which runs in the background
+    hub.start_coordinator(entry)
+
     return True
 
 
 # TODO Update entry annotation
 async def async_unload_entry(hass: HomeAssistant, entry: New_NameConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
+    if unload_ok:
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id, None)
+        if entry_data:
+            hub = entry_data["hub"]
+            await hub.async_save_state()
+            await hub.async_shutdown()
+            # closes the Modbus client if no other entry shares the connection
+            hub.close()
+    return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: New_NameConfigEntry) -> None:
+    """Remove the persisted state of a deleted entry."""
+    await _create_store(hass, entry).async_remove()
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: New_NameConfigEntry) -> bool:
+    """Migrate old config entries."""
+    if entry.version == 1 and entry.minor_version < 2:
+        # unique id gained the unit id, several inverters may share one gateway
+        unique_id = f"{entry.unique_id}:{entry.data.get(CONF_UNIT_ID, DEFAULT_UNIT_ID)}"
+        hass.config_entries.async_update_entry(entry, unique_id=unique_id, minor_version=2)
+        _LOGGER.info(f"Migrated {entry.title} to unique id {unique_id}")
+    return True
 
 
 async def _create_hub(hass: HomeAssistant, entry: New_NameConfigEntry) -> SolarMaxModbusHub | None:
@@ -67,41 +112,58 @@ async def _create_hub(hass: HomeAssistant, entry: New_NameConfigEntry) -> SolarM
             entry.options.get(CONF_PORT, entry.data.get(CONF_PORT, DEFAULT_PORT)),
             entry.options.get(CONF_SCAN_INTERVAL, entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)),
             entry.options.get("ping_host", entry.data.get("ping_host", None)),
+            entry.options.get(CONF_FAST_POLL, DEFAULT_FAST_POLL),
+            entry.options.get(CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL),
+            entry.data.get(CONF_UNIT_ID, DEFAULT_UNIT_ID),
+            entry.options.get(CONF_AGGREGATE_FAST, DEFAULT_AGGREGATE_FAST),
+            entry.data.get(CONF_TRANSPORT, DEFAULT_TRANSPORT),
+            entry.data.get(CONF_BAUDRATE, DEFAULT_BAUDRATE),
         )
         # Ensure the scan_interval is correctly passed to the hub
         scan_interval = entry.options.get(CONF_SCAN_INTERVAL, entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL))
         _LOGGER.info(f"Setting scan interval to {scan_interval} seconds")
-        _LOGGER.info(f"Starting hub with first refresh...")
-        await hub.async_config_entry_first_refresh()
-        _LOGGER.info(f"Hub first refresh completed, coordinator should run every {scan_interval} seconds")
+        hub.poll_phase = _poll_phase(hass, entry, hub)
+        await hub.async_restore_state(_create_store(hass, entry))
     except Exception as e:
         _LOGGER.error(f"Failed to set up SolarMax Modbus hub: {e}")
     return hub
 
-def _create_device_info(entry: New_NameConfigEntry) -> dict:
+def _poll_phase(hass: HomeAssistant, entry: New_NameConfigEntry, hub: SolarMaxModbusHub) -> float:
+    """Return the stored poll phase of the entry, or pick one away from the entries on the same link group."""
+    if CONF_POLL_PHASE in entry.data:
+        return entry.data[CONF_POLL_PHASE]
+    group = link_group(hub.connection.host, hub.connection.transport)
+    # phases are read from the entries, not the hubs, entries set up concurrently see each other
+    others = [
+        (link_group(other.data[CONF_HOST], other.data.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)), other.data[CONF_POLL_PHASE])
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id and CONF_POLL_PHASE in other.data
+    ]
+    same_group = [phase for other_group, phase in others if other_group == group]
+    phase = choose_phase(same_group or [phase for _, phase in others])
+    hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_POLL_PHASE: phase})
+    _LOGGER.info(f"{entry.title}: polls at {phase:.0%} of the poll interval")
+    return phase
+
+def _create_store(hass: HomeAssistant, entry: New_NameConfigEntry) -> Store:
+    """Create the store for the persisted state of an entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+
+def _create_device_info(entry: New_NameConfigEntry, hub: SolarMaxModbusHub) -> dict:
     """Create the device info for SolarMax Modbus hub."""
-    return {
+    device_info = {
         "identifiers": {(DOMAIN, entry.data[CONF_NAME])},
         "name": entry.data[CONF_NAME],
         "manufacturer": ATTR_MANUFACTURER
     }
-
-async def _can_use_icmp_lib_with_privilege() -> bool | None:
-    """Verify we can create a raw socket."""
-    try:
-        await async_ping("127.0.0.1", count=0, timeout=0, privileged=True)
-    except SocketPermissionError:
-        try:
-            await async_ping("127.0.0.1", count=0, timeout=0, privileged=False)
-        except SocketPermissionError:
-            _LOGGER.info(
-                "Cannot use icmplib because privileges are insufficient to create the"
-                " socket"
-            )
-            return None
-
-        _LOGGER.info("Using icmplib in privileged=False mode")
-        return False
-
-    _LOGGER.info("Using icmplib in privileged=True mode")
-    return True
+    # identity cached by the hub, see SolarMaxModbusHub.async_determineInverterType
+    if CONF_SERIAL_NUMBER in entry.data:
+        device_info["serial_number"] = entry.data[CONF_SERIAL_NUMBER]
+        device_info["model"] = entry.data[CONF_MODEL]
+    sw_version = hub.getSoftwareVersion(hub.inverter_data)
+    if sw_version is not None:
+        device_info["sw_version"] = sw_version
+    hw_version = hub.getHardwareVersion(hub.inverter_data)
+    if hw_version is not None:
+        device_info["hw_version"] = hw_version
+    return device_info
@@ -12,25 +12,52 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.util.network import is_host_valid
 import homeassistant.helpers.config_validation as cv
 
-from .const import DEFAULT_NAME, DEFAULT_PORT, DEFAULT_SCAN_INTERVAL, DOMAIN, DEFAULT_FAST_POLL
+from .const import (
+    DEFAULT_NAME,
+    DEFAULT_PORT,
+    DEFAULT_SCAN_INTERVAL,
+    DOMAIN,
+    DEFAULT_FAST_POLL,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    CONF_FAST_POLL,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_UNIT_ID,
+    DEFAULT_UNIT_ID,
+    CONF_AGGREGATE_FAST,
+    DEFAULT_AGGREGATE_FAST,
+    CONF_TRANSPORT,
+    DEFAULT_TRANSPORT,
+    TRANSPORTS,
+    TRANSPORT_SERIAL,
+    CONF_BAUDRATE,
+    DEFAULT_BAUDRATE,
+)
+from .connection import connection_key, link_settings_differ
 
 _LOGGER = logging.getLogger(__name__)
 
 CONFIG_DATA_SCHEMA = vol.Schema(
     {
     vol.Required(CONF_NAME, default=DEFAULT_NAME): str,
+    vol.Required(CONF_TRANSPORT, default=DEFAULT_TRANSPORT): vol.In(TRANSPORTS),
     vol.Required(CONF_HOST): str,
     vol.Required(CONF_PORT, default=DEFAULT_PORT):cv.port,
+    vol.Required(CONF_BAUDRATE, default=DEFAULT_BAUDRATE): vol.All(int, vol.Range(min=1200, max=115200)),
+    vol.Required(CONF_UNIT_ID, default=DEFAULT_UNIT_ID): vol.All(int, vol.Range(min=0, max=247)),
     vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(int, vol.Range(min=20, msg="invalid_scan_interval")),
     vol.Optional("ping_host", default=""): str,
+    vol.Optional(CONF_FAST_POLL, default=DEFAULT_FAST_POLL): bool,
+    vol.Optional(CONF_FAST_SCAN_INTERVAL, default=DEFAULT_FAST_SCAN_INTERVAL): vol.All(int, vol.Range(min=1)),
+    vol.Optional(CONF_AGGREGATE_FAST, default=DEFAULT_AGGREGATE_FAST): bool,
     }
 )
 
 
-async def validate_input(hass: HomeAssistant, user_data: dict[str, Any]): # -> dict[str, Any], dict[str, Any]:
+async def validate_input(hass: HomeAssistant, user_data: dict[str, Any], entry_id: str | None = None): # -> dict[str, Any], dict[str, Any]:
     """Validate the user input is correct.
 
-    Data has the keys from CONFIG_DATA_SCHEMA with values provided by the user.
+    Data has the keys from CONFIG_DATA_SCHEMA with values provided by the user,
+    entry_id is the entry being reconfigured.
     """
     errors = {}
     data = {}
@@ -41,19 +68,46 @@ async def validate_input(hass: HomeAssistant, user_data: dict[str, Any]): # -> d
             options[name] = user_data[name]
         else:
             data[name] = user_data[name]
-    if not is_host_valid(user_data[CONF_HOST]):
+    # the serial transport takes the device path, e.g. /dev/ttyUSB0, as host
+    if user_data[CONF_TRANSPORT] != TRANSPORT_SERIAL and not is_host_valid(user_data[CONF_HOST]):
         errors[CONF_HOST] = "invalid host"
     if user_data["ping_host"] != "" and not is_host_valid(user_data["ping_host"]):
         errors["ping_host"] = "invalid host"
+    if _link_conflict(hass, user_data, entry_id):
+        errors[CONF_TRANSPORT] = "link_settings_mismatch"
 
     # Return info that you want to store in the config entry.
     return errors, data, options
 
 
+def _link_conflict(hass: HomeAssistant, user_data: dict[str, Any], entry_id: str | None) -> bool:
+    """Return True if another entry uses the same gateway port or serial device with another transport or baud rate."""
+    key = connection_key(user_data[CONF_HOST], user_data[CONF_PORT], user_data[CONF_TRANSPORT])
+    for other in hass.config_entries.async_entries(DOMAIN):
+        if other.entry_id == entry_id:
+            continue
+        transport = other.data.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)
+        if connection_key(other.data[CONF_HOST], other.data.get(CONF_PORT, DEFAULT_PORT), transport) != key:
+            continue
+        if link_settings_differ(
+            transport, other.data.get(CONF_BAUDRATE, DEFAULT_BAUDRATE), user_data[CONF_TRANSPORT], user_data[CONF_BAUDRATE]
+        ):
+            return True
+    return False
+
+
+def _unique_id(user_data: dict[str, Any]) -> str:
+    """Return the unique id of an inverter: gateway address or serial device plus Modbus unit id."""
+    if user_data.get(CONF_TRANSPORT) == TRANSPORT_SERIAL:
+        return f"{user_data[CONF_HOST]}:{user_data[CONF_UNIT_ID]}"
+    return f"{user_data[CONF_HOST]}:{user_data[CONF_PORT]}:{user_data[CONF_UNIT_ID]}"
+
+
 class SolarMaxConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for home-assistant-solar-max-modbus."""
 
     VERSION = 1
+    MINOR_VERSION = 2
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -68,8 +122,8 @@ class SolarMaxConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors["base"] = f"unknown error {e}"
 
             if not errors:
-                await self.async_set_unique_id(user_input[CONF_HOST] + ":" + str(user_input[CONF_PORT]))
-                self._abort_if_unique_id_configured(error="host/port already configured")
+                await self.async_set_unique_id(_unique_id(user_input))
+                self._abort_if_unique_id_configured(error="host/port/unit already configured")
                 return self.async_create_entry(title=user_input[CONF_NAME], data=data, options=options)
 
         return self.async_show_form(
@@ -83,20 +137,53 @@ class SolarMaxConfigFlow(ConfigFlow, domain=DOMAIN):
         errors: dict[str, str] = {}
         if user_input:
             try:
-                errors, data, options = await validate_input(self.hass, user_input)
+                errors, data, options = await validate_input(
+                    self.hass, user_input, self._get_reconfigure_entry().entry_id
+                )
             except Exception as e:
                 _LOGGER.exception(f"Unexpected exception {e}")
                 errors["base"] = f"unknown error {e}"
+            entry = self._get_reconfigure_entry()
+            unique_id = _unique_id(user_input) if not errors else None
+            if unique_id is not None and any(
+                other.unique_id == unique_id and other.entry_id != entry.entry_id
+                for other in self._async_current_entries(include_ignore=False)
+            ):
+                return self.async_abort(reason="host/port/unit already configured")
             if not errors:
-                await self.async_set_unique_id(user_input[CONF_HOST] + ":" + str(user_input[CONF_PORT]))
-                _LOGGER.info(f"{user_input[CONF_HOST] + ":" + str(user_input[CONF_PORT])}")
-                self._abort_if_unique_id_configured(error="host/port already configured")
-                return self.async_update_reload_and_abort(
-                    self._get_reconfigure_entry(),
+                hub = self.hass.data.get(DOMAIN, {}).get(entry.entry_id, {}).get("hub")
+                if hub is None or user_input[CONF_NAME] != entry.data[CONF_NAME]:
+                    # the name is part of the device and entity ids, set the entry up again
+                    return self.async_update_reload_and_abort(
+                        entry,
+                        unique_id=unique_id,
+                        title=user_input[CONF_NAME],
+                        data_updates=data,
+                        options=options
+                    )
+                # apply in place: no reload, the connection is kept if the link is unchanged
+                await hub.reconfigure_connection_settings(
+                    user_input[CONF_HOST],
+                    user_input[CONF_PORT],
+                    user_input[CONF_UNIT_ID],
+                    user_input[CONF_TRANSPORT],
+                    user_input[CONF_BAUDRATE],
+                )
+                await hub.update_runtime_settings(
+                    user_input[CONF_SCAN_INTERVAL],
+                    user_input["ping_host"],
+                    user_input[CONF_FAST_POLL],
+                    user_input[CONF_FAST_SCAN_INTERVAL],
+                    user_input[CONF_AGGREGATE_FAST]
+                )
+                self.hass.config_entries.async_update_entry(
+                    entry,
+                    unique_id=unique_id,
                     title=user_input[CONF_NAME],
-                    data_updates=data,
-                    options=options
+                    data={**entry.data, **data},
+                    options=options,
                 )
+                return self.async_abort(reason="reconfigure_successful")
         data_schema = self.add_suggested_values_to_schema(CONFIG_DATA_SCHEMA, self._get_reconfigure_entry().data)
         data_schema = self.add_suggested_values_to_schema(data_schema, self._get_reconfigure_entry().options)
         return self.async_show_form(
@@ -126,7 +213,10 @@ class SolarMaxModbusOptionsFlowHandler(OptionsFlowWithConfigEntry):
                     # Update the hub configuration only if hub exists
                     await hub.update_runtime_settings(
                         user_input[CONF_SCAN_INTERVAL],
-                        user_input["ping_host"]
+                        user_input["ping_host"],
+                        user_input[CONF_FAST_POLL],
+                        user_input[CONF_FAST_SCAN_INTERVAL],
+                        user_input[CONF_AGGREGATE_FAST]
                     )
                 else:
                     # Hub not found - just log warning but continue to save options
@@ -0,0 +1,289 @@
+"""Modbus connections shared by all inverters behind one gateway or on one RS485 bus."""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import random
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.importlib import async_import_module
+
+if TYPE_CHECKING:
+    from pymodbus.client import ModbusBaseClient
+
+from .const import (
+    DOMAIN,
+    CONNECT_TIMEOUT,
+    SOCKET_CHECK_INTERVAL,
+    RECONNECT_BACKOFF_INITIAL,
+    RECONNECT_BACKOFF_MAX,
+    CIRCUIT_FAILURE_THRESHOLD,
+    REQUEST_TIMEOUT_MAX,
+    DEFAULT_BAUDRATE,
+    DEFAULT_TRANSPORT,
+    TRANSPORT_RTU_OVER_TCP,
+    TRANSPORT_SERIAL,
+    TRANSPORT_TCP,
+)
+from .scheduler import BusScheduler, rtu_frame_gap
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    """The link to the gateway is down, requests fail fast until it is back."""
+
+
+class ModbusConnection:
+    """One Modbus client per gateway or serial port, used by several hubs with different unit ids.
+
+    A background task owns the connection: it connects, checks the local
+    socket state and reconnects with jittered exponential backoff. A
+    half-open link still looks connected to it; the requests that time out
+    on it hand it back for a reconnect, see _record_failure. Polls only
+    borrow a ready connection. While the link is down the circuit is open and
+    requests fail immediately instead of waiting for a connect timeout.
+
+    Requests are serialized over the link by a BusScheduler, round-robin over
+    the unit ids. RTU transports keep the bus silent for the inter-frame gap
+    of the baud rate between two requests.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        host: str,
+        port: int,
+        transport: str = DEFAULT_TRANSPORT,
+        baudrate: int = DEFAULT_BAUDRATE,
+    ) -> None:
+        """Initialize the connection, host is the serial device for the serial transport."""
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.baudrate = baudrate
+        self._client: ModbusBaseClient = None  # type: ignore
+        self.bus = BusScheduler(0.0 if transport == TRANSPORT_TCP else rtu_frame_gap(baudrate))
+        self._unit_kwarg = "slave"
+        self._ready = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._circuit_open = False
+        self._failures = 0
+        # number of established connections, a change means the device may be another one
+        self.connects = 0
+        self.users: set[object] = set()
+
+    @property
+    def key(self) -> str:
+        """Return the key of this connection in the manager."""
+        return connection_key(self.host, self.port, self.transport)
+
+    @property
+    def connected(self) -> bool:
+        """Return True if the socket is connected."""
+        return self._client is not None and self._client.connected
+
+    @property
+    def circuit_open(self) -> bool:
+        """Return True while requests fail fast."""
+        return self._circuit_open
+
+    def start(self) -> None:
+        """Start the background task that owns the connection."""
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"{DOMAIN} connection {self.key}"
+            )
+
+    async def _async_run(self) -> None:
+        """Keep the connection up for as long as it is used."""
+        backoff = RECONNECT_BACKOFF_INITIAL
+        while True:
+            if self.connected or await self._async_try_connect():
+                if not self._ready.is_set():
+                    _LOGGER.info(f"Connected to Modbus client at {self.key}")
+                    self.connects += 1
+                backoff = RECONNECT_BACKOFF_INITIAL
+                self._circuit_open = False
+                self._failures = 0
+                self._ready.set()
+                # only the socket state is checked; the link is not kept alive with requests
+                await self._async_sleep(SOCKET_CHECK_INTERVAL)
+                continue
+            self._ready.clear()
+            if not self._circuit_open:
+                _LOGGER.warning(f"Modbus connection to {self.key} is down, retrying in the background")
+            self._circuit_open = True
+            delay = backoff * random.uniform(0.5, 1.5)
+            backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+            _LOGGER.debug(f"Reconnecting to {self.key} in {delay:.1f}s")
+            await self._async_sleep(delay)
+
+    async def _async_try_connect(self) -> bool:
+        """Try to connect once, return True on success."""
+        if self._client is None:
+            self._client = await self._async_create_client()
+            # pymodbus 3.10 renamed the unit id argument from slave to device_id
+            if "device_id" in inspect.signature(self._client.read_holding_registers).parameters:
+                self._unit_kwarg = "device_id"
+        _LOGGER.debug(f"Connecting to Modbus client at {self.key}...")
+        try:
+            async with asyncio.timeout(CONNECT_TIMEOUT):
+                await self._client.connect()
+        except Exception as e:
+            _LOGGER.debug(f"connection error {e}")
+        return self._client.connected
+
+    async def _async_create_client(self) -> ModbusBaseClient:
+        """Create the pymodbus client of the transport."""
+        # pymodbus is imported on the first connect, not when the integration loads
+        pymodbus = await async_import_module(self.hass, "pymodbus")
+        client_module = await async_import_module(self.hass, "pymodbus.client")
+        # reconnect_delay=0: reconnects are done by _async_run, not by pymodbus;
+        # retries=0: the hub retries with its adaptive timeout, pymodbus' timeout is only the upper bound
+        common = {"timeout": REQUEST_TIMEOUT_MAX, "retries": 0, "reconnect_delay": 0}
+        if self.transport == TRANSPORT_SERIAL:
+            return client_module.AsyncModbusSerialClient(
+                port=self.host, baudrate=self.baudrate, bytesize=8, parity="N", stopbits=1, **common
+            )
+        if self.transport == TRANSPORT_RTU_OVER_TCP:
+            # pymodbus 3.7 renamed Framer to FramerType
+            framer = getattr(pymodbus, "FramerType", None) or pymodbus.Framer
+            return client_module.AsyncModbusTcpClient(host=self.host, port=self.port, framer=framer.RTU, **common)
+        return client_module.AsyncModbusTcpClient(host=self.host, port=self.port, **common)
+
+    async def _async_sleep(self, delay: float) -> None:
+        """Sleep until delay has passed or the task is woken up."""
+        try:
+            async with asyncio.timeout(delay):
+                await self._wakeup.wait()
+        except TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def async_connect(self) -> None:
+        """Wait for a ready connection, raise CircuitOpenError while the link is down."""
+        if self._ready.is_set() and self.connected:
+            return
+        if self._circuit_open:
+            raise CircuitOpenError(f"Modbus connection to {self.key} is down")
+        self.start()
+        try:
+            async with asyncio.timeout(CONNECT_TIMEOUT):
+                await self._ready.wait()
+        except TimeoutError:
+            raise CircuitOpenError(f"Failed to connect to {self.key}") from None
+
+    def _record_failure(self) -> None:
+        """Count a failed transaction, hand a broken link back to the background task."""
+        self._failures += 1
+        if self.connected and self._failures < CIRCUIT_FAILURE_THRESHOLD:
+            return
+        _LOGGER.warning(f"Modbus connection to {self.key} failed {self._failures} times, reconnecting")
+        self._ready.clear()
+        self._circuit_open = True
+        if self._client is not None:
+            self._client.close()
+        self._wakeup.set()
+
+    async def read_holding_registers(
+        self, address: int, count: int, unit_id: int, timeout: float | None = None, low_priority: bool = False
+    ) -> Any:
+        """Read holding registers of one unit, waiting for its turn on the shared link."""
+        result, _ = await self.read_holding_registers_timed(address, count, unit_id, timeout, low_priority)
+        return result
+
+    async def read_holding_registers_timed(
+        self, address: int, count: int, unit_id: int, timeout: float | None = None, low_priority: bool = False
+    ) -> tuple[Any, float]:
+        """Read holding registers, return the response and the round trip time without the bus wait.
+
+        Raises TimeoutError if no answer arrived within timeout seconds. The
+        timeout bounds the request only, not the wait for the bus or the
+        connect; a caller cancelling the read does not count as link failure.
+        A low priority read waits until no other request is queued on the link.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.bus.turn(unit_id, low_priority):
+            await self.async_connect()
+            start = loop.time()
+            try:
+                async with asyncio.timeout(timeout):
+                    result = await self._client.read_holding_registers(
+                        address, count=count, **{self._unit_kwarg: unit_id}
+                    )
+            except TimeoutError:
+                self._record_failure()
+                raise
+            except Exception as e:
+                self._record_failure()
+                raise ConnectionError(f"{self.key} unit {unit_id}: {e}") from e
+            self._failures = 0
+            return result, loop.time() - start
+
+    def close(self) -> None:
+        """Stop the background task and close the socket."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            _LOGGER.info(f"Closing Modbus connection to {self.key}")
+            self._client.close()
+            self._client = None  # type: ignore
+        self._ready.clear()
+
+
+def connection_key(host: str, port: int, transport: str = DEFAULT_TRANSPORT) -> str:
+    """Return the key of a link: host:port, or the device of a serial port."""
+    if transport == TRANSPORT_SERIAL:
+        return host
+    return f"{host}:{port}"
+
+
+def link_settings_differ(transport: str, baudrate: int, other_transport: str, other_baudrate: int) -> bool:
+    """Return True if two entries on the same link cannot share its connection."""
+    if transport != other_transport:
+        return True
+    # the baud rate only matters on an RS485 bus
+    return transport != TRANSPORT_TCP and baudrate != other_baudrate
+
+
+def get_connection(
+    hass: HomeAssistant,
+    host: str,
+    port: int,
+    user: object,
+    transport: str = DEFAULT_TRANSPORT,
+    baudrate: int = DEFAULT_BAUDRATE,
+) -> ModbusConnection:
+    """Return the shared connection for the link and register user on it."""
+    connections: dict[str, ModbusConnection] = hass.data[DOMAIN].setdefault("connections", {})
+    key = connection_key(host, port, transport)
+    connection = connections.get(key)
+    if connection is not None and link_settings_differ(connection.transport, connection.baudrate, transport, baudrate):
+        # one gateway port or serial device speaks one framing at one baud rate
+        raise ValueError(
+            f"{key} is already used with transport {connection.transport} at {connection.baudrate} baud,"
+            f" not {transport} at {baudrate} baud"
+        )
+    if connection is None:
+        connection = connections[key] = ModbusConnection(hass, host, port, transport, baudrate)
+        connection.start()
+    connection.users.add(user)
+    return connection
+
+
+def release_connection(hass: HomeAssistant, connection: ModbusConnection, user: object) -> None:
+    """Unregister user and close the connection when nobody uses it anymore."""
+    connection.users.discard(user)
+    if connection.users:
+        return
+    connection.close()
+    connections: dict[str, ModbusConnection] = hass.data[DOMAIN].get("connections", {})
+    if connections.get(connection.key) is connection:
+        del connections[connection.key]
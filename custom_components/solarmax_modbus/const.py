@@ -3,6 +3,7 @@
 
 from homeassistant.const import (
     UnitOfElectricCurrent,
+    UnitOfTemperature,
     UnitOfElectricPotential,
     UnitOfPower,
     UnitOfReactivePower,
@@ -21,34 +22,157 @@ DOMAIN = "solarmax_modbus"
 DEFAULT_NAME = "SolarMax"
 DEFAULT_SCAN_INTERVAL = 60
 DEFAULT_PORT = 502
+DEFAULT_UNIT_ID = 1
+CONF_UNIT_ID = "unit_id"
+# Modbus transport: TCP, RTU frames through a transparent TCP bridge, or RTU on a serial port
+CONF_TRANSPORT = "transport"
+TRANSPORT_TCP = "tcp"
+TRANSPORT_RTU_OVER_TCP = "rtu_over_tcp"
+TRANSPORT_SERIAL = "serial"
+TRANSPORTS = [TRANSPORT_TCP, TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL]
+DEFAULT_TRANSPORT = TRANSPORT_TCP
+# baud rate of the RS485 bus, also used for the frame timing behind an RTU bridge
+CONF_BAUDRATE = "baudrate"
+DEFAULT_BAUDRATE = 9600
 CONF_SOLARMAX_HUB = "solarmax_hub"
 DEFAULT_FAST_POLL = False
+DEFAULT_FAST_SCAN_INTERVAL = 5
+CONF_FAST_POLL = "fast_poll"
+CONF_FAST_SCAN_INTERVAL = "fast_scan_interval"
+# publish the fast values as mean over the scan interval instead of every sample
+CONF_AGGREGATE_FAST = "aggregate_fast"
+DEFAULT_AGGREGATE_FAST = False
+AGGREGATE_MAX_SAMPLES = 300
+
+# register groups polled at their own rate
+POLL_GROUP_FAST = "fast"
+POLL_GROUP_SLOW = "slow"
+# read planner: cost of one request round trip in transferred registers,
+# and the most registers a single read may return (Modbus PDU limit)
+READ_REQUEST_COST = 16
+MAX_READ_REGISTERS = 125
+# Modbus exception code of a read of registers the device does not have; only this
+# exception makes the hub bisect a block, all others are read failures
+ILLEGAL_DATA_ADDRESS = 0x02
+# register ranges the inverter rejected are retried with full blocks this often (seconds)
+LAYOUT_REPROBE_INTERVAL = 21600
+
+# measurement block of the 6SMT/10KTL series
+REGISTER_BASE_ADDRESS = 4097
+REGISTER_BLOCK_COUNT = 60
+# serial number, two ASCII characters per register
+SERIAL_NUMBER_ADDRESS = 6672
+SERIAL_NUMBER_COUNT = 7
+
+# inverter identity cached in the config entry data
+CONF_SERIAL_NUMBER = "serial_number"
+CONF_MODEL = "model"
+DEFAULT_INVERTER_TYPE = "SOLARMAX_6SMT_10KTL"
+DEFAULT_MODEL = "SolarMax"
+# inverter type (selects the register map) and model by serial number prefix
+SERIAL_PREFIX_MODELS = {"2245-": (DEFAULT_INVERTER_TYPE, "SolarMax 6SMT")}
+CONF_INVERTER_TYPE = "inverter_type"
+
+# rarely changing device info registers (address, count) per inverter type, read
+# in the idle time between polls; None: the address is not documented yet
+DEVICE_INFO_REGISTERS = {
+    DEFAULT_INVERTER_TYPE: {
+        "serial_number": (SERIAL_NUMBER_ADDRESS, SERIAL_NUMBER_COUNT),
+        "firmware_version": None,
+        "hardware_version": None,
+    },
+}
+# device info is read again after this many seconds
+DEVICE_INFO_TTL = 86400
+# device info is only read if the next poll is at least this far away (seconds)
+DEVICE_INFO_IDLE_MARGIN = 2
+
+# ping the inverter only after failures or this long without a successful read (seconds)
+LIVENESS_IDLE_TIMEOUT = 300
+# ping backoff while the inverter is offline (seconds)
+PING_BACKOFF_INITIAL = 60
+PING_BACKOFF_MAX = 600
+
+# connection lifecycle (seconds)
+CONNECT_TIMEOUT = 10
+# the connection task checks the local socket state this often; it sends no request,
+# a half-open link is found by the request timeouts, see CIRCUIT_FAILURE_THRESHOLD
+SOCKET_CHECK_INTERVAL = 30
+RECONNECT_BACKOFF_INITIAL = 5
+RECONNECT_BACKOFF_MAX = 300
+# request timeouts adapt to the round trip time within these bounds (seconds)
+REQUEST_TIMEOUT_INITIAL = 3
+REQUEST_TIMEOUT_MIN = 0.5
+REQUEST_TIMEOUT_MAX = 10
+# retries of a timed out request within one poll cycle
+REQUEST_RETRIES = 1
+# a poll cycle stops reading after this part of the poll interval and publishes what it has
+CYCLE_DEADLINE_FRACTION = 0.8
+# consecutive failed requests before the link is considered broken
+CIRCUIT_FAILURE_THRESHOLD = 3
+
+# adaptive poll rate while the inverter sleeps (seconds)
+NIGHT_SCAN_INTERVAL = 900
+SUNRISE_PROBE_WINDOW = 1800
+SUNRISE_PROBE_INTERVAL = 30
+# inverter modes (and hub states) in which the inverter produces nothing
+INVERTER_IDLE_MODES = ("Standby", "Shutdown", "offline")
+# keys read even if their entity is disabled, the hub itself needs them
+REQUIRED_KEYS = ("InverterMode",)
+
+# sensors computed by the hub and the register keys they are computed from
+DERIVED_KEYS = {"Total_Energy_Precise": ("Active_Power", "Total_Energy")}
+# energy integration: resolution of the Total_Energy counter (kWh) and the longest
+# gap between two power samples that is still integrated (seconds)
+ENERGY_COUNTER_RESOLUTION = 1
+ENERGY_INTEGRATION_MAX_GAP = 600
+
+# number of poll cycles the timing statistics are computed over
+POLL_STATS_WINDOW = 100
+# poll statistics sensors write their state when p95 moves by more than this part,
+# smaller changes at most once per interval (seconds)
+POLL_STATS_DEADBAND_RELATIVE = 0.2
+POLL_STATS_WRITE_INTERVAL = 60
+# raw frames and poll cycles kept for the diagnostics download
+DIAGNOSTICS_FRAME_COUNT = 50
+
+# phase of the hub's polls within the poll interval (fraction), kept in the entry data
+CONF_POLL_PHASE = "poll_phase"
+# the next poll is on the first slot at least this part of the interval away
+STAGGER_MIN_GAP = 0.5
+
+# persisted last state of every hub, restored at startup
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 60
+
+# unchanged values are written to the state machine at least this often (seconds)
+DEFAULT_FORCE_REFRESH_INTERVAL = 300
 
 SENSOR_TYPES = {}
 
 line_sensor = [
-    {"name": "Voltage",   "type": "UINT16", "factor":  0.1,
+    {"name": "Voltage",   "type": "UINT16", "factor":  0.1, "deadband": 0.1,
      "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
     {"name": "Current",   "type": "UINT16", "factor": 0.01,
      "unit": UnitOfElectricCurrent.AMPERE, "device_class": SensorDeviceClass.CURRENT,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:current-ac"},
-    {"name": "Power",     "type": "UINT32", "factor":  0.1,
+    {"name": "Power",     "type": "UINT32", "factor":  0.1, "poll_group": POLL_GROUP_FAST,
      "unit": UnitOfPower.WATT, "device_class": SensorDeviceClass.POWER,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:transmission-tower"},
-    {"name": "Frequency", "type": "UINT16", "factor": 0.01,
+    {"name": "Frequency", "type": "UINT16", "factor": 0.01, "deadband": 0.01,
      "unit": UnitOfFrequency.HERTZ, "device_class": SensorDeviceClass.FREQUENCY,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
 ]
 
 pv_sensor = [
-    {"name": "Voltage",   "type": "UINT16", "factor":  0.1,
+    {"name": "Voltage",   "type": "UINT16", "factor":  0.1, "deadband_relative": 0.002,
      "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:current-dc"},
     {"name": "Current",   "type": "UINT16", "factor": 0.01,
      "unit": UnitOfElectricCurrent.AMPERE, "device_class": SensorDeviceClass.CURRENT,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:current-dc"},
-    {"name": "Power",     "type": "UINT32", "factor":  0.1,
+    {"name": "Power",     "type": "UINT32", "factor":  0.1, "poll_group": POLL_GROUP_FAST,
      "unit": UnitOfPower.WATT, "device_class": SensorDeviceClass.POWER,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:solar-power"},
 ]
@@ -69,10 +193,10 @@ energy_sensor = [
 ]
 
 power_sensors = [
-    {"name": "Active Power", "type": "UINT32", "factor":  0.1,
+    {"name": "Active Power", "type": "UINT32", "factor":  0.1, "poll_group": POLL_GROUP_FAST,
      "unit": UnitOfPower.WATT, "device_class": SensorDeviceClass.POWER,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:flash"},
-    {"name": "Reactive Power", "type": "UINT32", "factor":  0.1,
+    {"name": "Reactive Power", "type": "UINT32", "factor":  0.1, "poll_group": POLL_GROUP_FAST,
      "unit": UnitOfReactivePower.VOLT_AMPERE_REACTIVE, "device_class": SensorDeviceClass.REACTIVE_POWER,
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:flash-outline"},
     {"name": "Today max Power", "type": "UINT32", "factor":  0.1,
@@ -80,6 +204,13 @@ power_sensors = [
      "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:solar-power"},
 ]
 
+state_sensors = [
+    {"name": "Temperature", "type": "UINT16", "factor": 1,
+     "unit": UnitOfTemperature.CELSIUS, "icon": "mdi:thermometer"},
+    {"name": "Inverter Mode", "key": "InverterMode", "type": "STATUS_INVERTER_MODE", "factor": 1,
+     "poll_group": POLL_GROUP_FAST, "icon": "mdi:information-outline"},
+]
+
 STATUS_INVERTER_MODE = {
   0: "Initial Mode",
   1: "Standby",
@@ -88,3 +219,14 @@ STATUS_INVERTER_MODE = {
   9: "Shutdown"
 }
 
+# Register maps of the measurement block by inverter type. Each section lists
+# sensors stored back to back from offset on, repeated for every prefix.
+REGISTER_MAPS = {
+    DEFAULT_INVERTER_TYPE: (
+        {"offset": 0, "sensors": line_sensor, "prefixes": ("L1", "L2", "L3")},
+        {"offset": 15, "sensors": pv_sensor, "prefixes": ("PV1", "PV2", "PV3")},
+        {"offset": 27, "sensors": state_sensors},
+        {"offset": 32, "sensors": energy_sensor},
+        {"offset": 54, "sensors": power_sensors},
+    ),
+}
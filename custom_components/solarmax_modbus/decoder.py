@@ -0,0 +1,97 @@
+"""Compiled register decoding for the SolarMax Modbus hub."""
+
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+from . import const as _const
+
+# struct code and register length for the pymodbus DATATYPE names used in the maps
+STRUCT_CODES = {
+    "INT16": ("h", 1),
+    "UINT16": ("H", 1),
+    "INT32": ("i", 2),
+    "UINT32": ("I", 2),
+    "INT64": ("q", 4),
+    "UINT64": ("Q", 4),
+    "FLOAT32": ("f", 2),
+    "FLOAT64": ("d", 4),
+}
+
+
+def register_length(data_type: str) -> int:
+    """Return the number of registers a value of data_type occupies."""
+    if data_type.startswith("STATUS"):
+        return 1
+    return STRUCT_CODES[data_type][1]
+
+
+def decode_string(registers: list[int]) -> str:
+    """Decode ASCII text stored two characters per register, NUL padding is dropped."""
+    raw = struct.pack(f">{len(registers)}H", *registers)
+    return raw.replace(b"\0", b"").decode("ascii", errors="ignore").strip()
+
+
+class RegisterDecodePlan:
+    """Decode a block of holding registers in a single struct pass.
+
+    The plan is compiled once from the key_dict built by the sensor platform
+    ({offset: {"key", "type", "factor"}}). Offsets are relative to the first
+    register of the measurement block; start and count select the part of the
+    block this plan decodes.
+    """
+
+    __slots__ = ("start", "count", "keys", "_raw", "_values", "_scaled", "_status")
+
+    def __init__(self, key_dict: dict[int, dict[str, Any]], start: int = 0, count: int | None = None) -> None:
+        """Compile the plan."""
+        fmt = ">"
+        pos = start
+        keys = []
+        scaled = []
+        status = []
+        for offset in sorted(key_dict):
+            entry = key_dict[offset]
+            data_type: str = entry["type"]
+            if offset < start:
+                continue
+            if data_type.startswith("STATUS"):
+                code, length = "H", 1
+            else:
+                code, length = STRUCT_CODES[data_type]
+            if count is not None and offset + length > start + count:
+                break
+            if offset > pos:
+                fmt += f"{2 * (offset - pos)}x"
+            fmt += code
+            pos = offset + length
+            if data_type.startswith("STATUS"):
+                status.append((len(keys), entry["key"], getattr(_const, data_type)))
+            else:
+                scaled.append((len(keys), entry["key"], entry.get("factor", 1)))
+            keys.append(entry["key"])
+        if count is None:
+            count = pos - start
+        elif pos < start + count:
+            fmt += f"{2 * (start + count - pos)}x"
+        self.start = start
+        self.count = count
+        self.keys = tuple(keys)
+        self._raw = struct.Struct(f">{count}H")
+        self._values = struct.Struct(fmt)
+        self._scaled = tuple(scaled)
+        self._status = tuple(status)
+
+    def decode(self, registers: list[int]) -> dict[str, Any]:
+        """Decode the raw registers of this block into scaled values."""
+        if len(registers) != self.count:
+            raise ValueError(f"expected {self.count} registers, got {len(registers)}")
+        values = self._values.unpack(self._raw.pack(*registers))
+        result = {key: values[idx] * factor for idx, key, factor in self._scaled}
+        for idx, key, table in self._status:
+            q = values[idx]
+            name = table.get(q)
+            result[key] = name if name is not None else f"unknown {q}"
+        return result
+
@@ -0,0 +1,44 @@
+"""Diagnostics support for SolarMax Modbus."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_SERIAL_NUMBER
+
+# the unique id contains the host
+TO_REDACT = {CONF_HOST, "ping_host", CONF_SERIAL_NUMBER, "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry: raw frames, their decoded values and poll timings."""
+    diagnostics: dict[str, Any] = {"entry": async_redact_data(entry.as_dict(), TO_REDACT)}
+    hub = hass.data.get(DOMAIN, {}).get(entry.entry_id, {}).get("hub")
+    if hub is None:
+        return diagnostics
+    frames = hub.frame_log.frames()
+    for frame in frames:
+        frame["decoded"] = hub.decode_frame(frame["address"], frame["registers"])
+    diagnostics.update({
+        "last_update_success": hub.last_update_success,
+        "data": hub.data,
+        "poll_stats": hub.poll_stats.as_dict(),
+        "bus": {
+            "transport": hub.connection.transport,
+            "inter_frame_gap": hub.connection.bus.inter_frame_gap,
+            "busy_time": hub.connection.bus.busy_time,
+        },
+        "device_info": hub.device_info,
+        "request_timeout": hub.rtt.as_dict(),
+        "stale_keys": sorted(hub.stale_keys),
+        "excluded_ranges": sorted(hub.excluded_ranges),
+        "frames": frames,
+        "cycles": hub.frame_log.cycles(),
+    })
+    # the serial number is also cached by the hub, redact it wherever it appears
+    return async_redact_data(diagnostics, TO_REDACT)
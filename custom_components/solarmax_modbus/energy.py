@@ -0,0 +1,64 @@
+"""High resolution energy counter from power samples and the inverter's kWh counter."""
+
+from __future__ import annotations
+
+from .const import ENERGY_COUNTER_RESOLUTION, ENERGY_INTEGRATION_MAX_GAP
+
+
+class EnergyIntegrator:
+    """Integrate power samples between the increments of a coarse energy counter.
+
+    The value is the last counter reading plus the trapezoidal integral of
+    the power since that reading. The integral is capped just below the
+    counter resolution, so the value never runs ahead of the next increment;
+    when the counter moves the integral restarts from the new reading.
+    Samples further apart than max_gap are not integrated across.
+    """
+
+    __slots__ = ("_resolution", "_max_gap", "_anchor", "_integral", "_last_time", "_last_power", "_value")
+
+    def __init__(
+        self,
+        resolution: float = ENERGY_COUNTER_RESOLUTION,
+        max_gap: float = ENERGY_INTEGRATION_MAX_GAP,
+    ) -> None:
+        """Initialize the integrator."""
+        self._resolution = resolution
+        self._max_gap = max_gap
+        self._anchor: float | None = None
+        self._integral = 0.0
+        self._last_time: float | None = None
+        self._last_power = 0.0
+        self._value: float | None = None
+
+    def restore(self, value: float) -> None:
+        """Continue from a persisted value, the counter will not go below it."""
+        self._value = value
+
+    def add_power(self, now: float, power: float) -> None:
+        """Add a power sample in W taken at monotonic time now."""
+        if self._last_time is not None and 0 < now - self._last_time <= self._max_gap:
+            self._integral += (self._last_power + power) / 2 * (now - self._last_time) / 3_600_000
+        self._last_time = now
+        self._last_power = power
+
+    def sync(self, total: float) -> None:
+        """Re-anchor to a reading of the energy counter in kWh."""
+        if total == self._anchor:
+            return
+        if self._anchor is not None and total < self._anchor:
+            # counter was reset, follow it down
+            self._value = None
+        self._anchor = total
+        self._integral = 0.0
+
+    @property
+    def value(self) -> float | None:
+        """Return the energy in kWh, None before the first counter reading."""
+        if self._anchor is None:
+            return None
+        value = self._anchor + min(self._integral, self._resolution * 0.999)
+        if self._value is not None and value < self._value:
+            value = self._value
+        self._value = value
+        return round(value, 3)
@@ -0,0 +1,92 @@
+"""Fixed-size, array-backed log of raw register frames and poll timings."""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+
+from .const import DIAGNOSTICS_FRAME_COUNT, MAX_READ_REGISTERS
+from .stats import POLL_PHASES
+
+
+class FrameLog:
+    """Ring buffers of the last raw frames and the phase timings of the last poll cycles.
+
+    All storage is preallocated in typed arrays, so memory stays the same no
+    matter how long Home Assistant runs.
+    """
+
+    def __init__(self, capacity: int = DIAGNOSTICS_FRAME_COUNT, max_registers: int = MAX_READ_REGISTERS) -> None:
+        """Allocate the buffers."""
+        self._capacity = capacity
+        self._max_registers = max_registers
+        self._registers = array("H", bytes(2 * capacity * max_registers))
+        self._address = array("H", bytes(2 * capacity))
+        self._count = array("H", bytes(2 * capacity))
+        self._frame_time = array("d", bytes(8 * capacity))
+        self._rtt = array("f", bytes(4 * capacity))
+        self._frame_pos = 0
+        self._frames = 0
+        self._timings = array("f", bytes(4 * capacity * len(POLL_PHASES)))
+        self._cycle_time = array("d", bytes(8 * capacity))
+        self._cycle_ok = array("B", bytes(capacity))
+        self._cycle_pos = 0
+        self._cycles = 0
+
+    def record_frame(self, timestamp: float, address: int, registers: list[int], rtt: float) -> None:
+        """Store one raw register frame."""
+        slot = self._frame_pos
+        count = min(len(registers), self._max_registers)
+        base = slot * self._max_registers
+        self._registers[base:base + count] = array("H", registers[:count])
+        self._address[slot] = address
+        self._count[slot] = count
+        self._frame_time[slot] = timestamp
+        self._rtt[slot] = rtt
+        self._frame_pos = (slot + 1) % self._capacity
+        self._frames = min(self._frames + 1, self._capacity)
+
+    def record_cycle(self, timestamp: float, timings: dict[str, float], success: bool) -> None:
+        """Store the phase timings of one poll cycle in seconds, missing phases as 0."""
+        slot = self._cycle_pos
+        base = slot * len(POLL_PHASES)
+        for index, phase in enumerate(POLL_PHASES):
+            self._timings[base + index] = timings.get(phase, 0.0)
+        self._cycle_time[slot] = timestamp
+        self._cycle_ok[slot] = success
+        self._cycle_pos = (slot + 1) % self._capacity
+        self._cycles = min(self._cycles + 1, self._capacity)
+
+    def _slots(self, pos: int, size: int) -> range:
+        """Return the slot indices from oldest to newest."""
+        return range(pos - size, pos)
+
+    def frames(self) -> list[dict[str, Any]]:
+        """Return the stored frames, oldest first."""
+        result = []
+        for index in self._slots(self._frame_pos, self._frames):
+            slot = index % self._capacity
+            base = slot * self._max_registers
+            result.append({
+                "timestamp": self._frame_time[slot],
+                "address": self._address[slot],
+                "registers": self._registers[base:base + self._count[slot]].tolist(),
+                "rtt_ms": round(self._rtt[slot] * 1000, 1),
+            })
+        return result
+
+    def cycles(self) -> list[dict[str, Any]]:
+        """Return the stored poll cycle timings in milliseconds, oldest first."""
+        result = []
+        for index in self._slots(self._cycle_pos, self._cycles):
+            slot = index % self._capacity
+            base = slot * len(POLL_PHASES)
+            result.append({
+                "timestamp": self._cycle_time[slot],
+                "success": bool(self._cycle_ok[slot]),
+                **{
+                    phase: round(self._timings[base + i] * 1000, 1)
+                    for i, phase in enumerate(POLL_PHASES)
+                },
+            })
+        return result
@@ -1,215 +1,836 @@
 
 import asyncio
 import logging
+import math
 import time
 from typing import Any
-from datetime import timedelta
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from pymodbus.client import AsyncModbusTcpClient
-from random import randint
-from icmplib import NameLookupError, async_ping
-from .const import DOMAIN
-from . import const as _const
+from datetime import datetime, timedelta
+from homeassistant.const import CONF_NAME, SUN_EVENT_SUNRISE
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.sun import get_astral_event_next, is_up
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from .const import (
+    DOMAIN,
+    REGISTER_BASE_ADDRESS,
+    DEFAULT_FORCE_REFRESH_INTERVAL,
+    DEFAULT_FAST_POLL,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_UNIT_ID,
+    DEFAULT_AGGREGATE_FAST,
+    DEFAULT_TRANSPORT,
+    DEFAULT_BAUDRATE,
+    POLL_GROUP_FAST,
+    POLL_GROUP_SLOW,
+    NIGHT_SCAN_INTERVAL,
+    SUNRISE_PROBE_WINDOW,
+    SUNRISE_PROBE_INTERVAL,
+    INVERTER_IDLE_MODES,
+    REQUIRED_KEYS,
+    DERIVED_KEYS,
+    STORAGE_SAVE_DELAY,
+    REQUEST_RETRIES,
+    CYCLE_DEADLINE_FRACTION,
+    STAGGER_MIN_GAP,
+    SERIAL_NUMBER_ADDRESS,
+    SERIAL_NUMBER_COUNT,
+    CONF_SERIAL_NUMBER,
+    CONF_MODEL,
+    CONF_INVERTER_TYPE,
+    DEFAULT_INVERTER_TYPE,
+    DEFAULT_MODEL,
+    SERIAL_PREFIX_MODELS,
+    DEVICE_INFO_REGISTERS,
+    DEVICE_INFO_TTL,
+    DEVICE_INFO_IDLE_MARGIN,
+    LAYOUT_REPROBE_INTERVAL,
+    ILLEGAL_DATA_ADDRESS,
+)
+from .connection import CircuitOpenError, ModbusConnection, get_connection, release_connection
+from .decoder import RegisterDecodePlan, decode_string, register_length
+from .energy import EnergyIntegrator
+from .liveness import LivenessTracker
+from .ping import HostResolveError, async_ping_host
+from .planner import plan_reads, split_plan
+from .rtt import RttEstimator
+from .stats import PollStats, SampleWindow
+from .framelog import FrameLog
 
 _LOGGER = logging.getLogger(__name__)
 
+
+class RejectedReadError(ConnectionError):
+    """The inverter answered a block read with an illegal data address exception."""
+
+
 class SolarMaxModbusHub(DataUpdateCoordinator[dict[str, Any]]):
     """SolarMax Modbus hub."""
-    def __init__(self, hass: HomeAssistant, name: str, host: str, port: int, scan_interval: int, ping_host: str | None) -> None:
+    def __init__(self, hass: HomeAssistant, name: str, host: str, port: int, scan_interval: int, ping_host: str | None,
+                 fast_poll: bool = DEFAULT_FAST_POLL, fast_scan_interval: int = DEFAULT_FAST_SCAN_INTERVAL,
+                 unit_id: int = DEFAULT_UNIT_ID, aggregate_fast: bool = DEFAULT_AGGREGATE_FAST,
+                 transport: str = DEFAULT_TRANSPORT, baudrate: int = DEFAULT_BAUDRATE) -> None:
         """Initialize the SolarMax Modbus hub."""
         super().__init__(
             hass,
             _LOGGER,
             name=name,
-            update_interval=timedelta(seconds=scan_interval),
+            update_interval=timedelta(seconds=fast_scan_interval if fast_poll else scan_interval),
             update_method=self._async_update_data,
         )
         self._host = host
         self._port = port
+        self._unit_id = unit_id
+        self._transport = transport
+        self._baudrate = baudrate
         self._scan_interval = scan_interval
+        self._fast_poll = fast_poll
+        self._fast_scan_interval = fast_scan_interval
+        self._aggregate_fast = aggregate_fast
+        self._windows: dict[str, SampleWindow] = {}
+        self._next_publish = 0.0
+        # min/max/samples of the aggregated values, by key
+        self.aggregates: dict[str, dict[str, float | int]] = {}
+        self._energy = EnergyIntegrator()
         self._ping_host = ping_host
         self._ping_host_reachable = False
+        self._liveness = LivenessTracker()
+        self._offline_state = "offline"
+        self._sunrise_probe = False
+        self.poll_stats = PollStats()
+        self.rtt = RttEstimator()
+        self._cycle_deadline = 0.0
+        # keys whose registers were not read before the cycle deadline, they keep the last value
+        self.stale_keys: set[str] = set()
+        self.frame_log = FrameLog()
         self.inverter_data: dict[str, Any] = {}
+        # identity cached in the config entry, re-read once per new connection
+        entry_data = self.config_entry.data if self.config_entry is not None else {}
+        self.serial_number: str | None = entry_data.get(CONF_SERIAL_NUMBER)
+        self.inverter_model: str | None = entry_data.get(CONF_MODEL)
+        # selects the register map of the sensor platform
+        self.inverter_type: str | None = entry_data.get(CONF_INVERTER_TYPE)
+        self._identified_connects = 0
+        # device info registers read in the idle time between polls, by name
+        self.device_info: dict[str, str] = {}
+        self._device_info_read_at: dict[str, float] = {}
+        self._device_info_task: asyncio.Task | None = None
+        # loop time of the next scheduled refresh
+        self._next_refresh_at = 0.0
+        # fraction of the poll interval this hub polls at, see stagger.choose_phase
+        self.poll_phase = 0.0
+        self._store: Store | None = None
+        self._save_pending = False
         self._key_dict = {}
-        self._client: AsyncModbusTcpClient # to get rid of the pylance errors
-        self._client = None # type: ignore
-        self._icmp_privileged = hass.data[DOMAIN]["icmp_privileged"]
+        self._group_plans: dict[str, list[RegisterDecodePlan]] = {}
+        self._group_next_due: dict[str, float] = {}
+        self._enabled_keys: set[str] = set()
+        self._plan_dirty = False
+        # register ranges (start, end) the inverter rejects, learned by bisecting failed block reads
+        self._excluded_ranges: set[tuple[int, int]] = set()
+        self._layout_reprobe_at = 0.0
+        self._deadbands: dict[str, tuple[float, float]] = {}
+        self._published: dict[str, Any] = {}
+        self._published_at: dict[str, float] = {}
+        self.changed_keys: set[str] = set()
+        self._connection: ModbusConnection = get_connection(hass, host, port, self, transport, baudrate)
+
+    @property
+    def connection(self) -> ModbusConnection:
+        """Return the shared Modbus connection the hub reads through."""
+        return self._connection
+
+    @property
+    def excluded_ranges(self) -> frozenset[tuple[int, int]]:
+        """Return the register ranges (start, end) the inverter rejects."""
+        return frozenset(self._excluded_ranges)
 
-    async def start_coordinator(self) -> None:
-        """Ensure the coordinators are running and scheduled."""
+    def start_coordinator(self, entry: ConfigEntry) -> None:
+        """Run the first refresh in the background, setup does not wait for the inverter."""
         _LOGGER.info("Starting main coordinator scheduling... ")
+        entry.async_create_background_task(self.hass, self.async_refresh(), f"{DOMAIN} {self.name} first refresh")
+
+    async def async_restore_state(self, store: Store) -> None:
+        """Load the state persisted by the last run, entities start with these values."""
+        self._store = store
         try:
-            await self.async_request_refresh()
-            _LOGGER.info("Main coordinator refresh requested")
+            stored = await store.async_load()
         except Exception as e:
-            _LOGGER.error(f"Failed to request main coordinator refresh: {e}")
+            _LOGGER.warning(f"{self.name}: could not restore the last state: {e}")
+            return
+        if not stored:
+            return
+        self.inverter_data.update(stored.get("data", {}))
+        if "Total_Energy_Precise" in self.inverter_data:
+            self._energy.restore(self.inverter_data["Total_Energy_Precise"])
+        for name, (value, read_at) in stored.get("device_info", {}).items():
+            self.device_info[name] = value
+            self._device_info_read_at[name] = read_at
+        excluded = {(start, end) for start, end in stored.get("excluded_ranges", [])}
+        if excluded:
+            self._set_excluded_ranges(excluded)
+        self.data = self.inverter_data
+        _LOGGER.debug(f"{self.name}: restored {len(self.inverter_data)} values")
+
+    @callback
+    def _data_to_store(self) -> dict[str, Any]:
+        """Return the state to persist."""
+        self._save_pending = False
+        return {
+            "data": self.inverter_data,
+            "device_info": {
+                name: (value, self._device_info_read_at.get(name, 0)) for name, value in self.device_info.items()
+            },
+            "excluded_ranges": sorted(self._excluded_ranges),
+        }
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Persist the state within STORAGE_SAVE_DELAY.
+
+        async_delay_save postpones a pending write on every call, with polls
+        more often than the delay it would never write; it is only called
+        when no write is pending.
+        """
+        if self._store is not None and not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_store, STORAGE_SAVE_DELAY)
+
+    async def async_save_state(self) -> None:
+        """Persist the state now."""
+        if self._store is not None:
+            await self._store.async_save(self._data_to_store())
 
     async def _async_host_alive(self, host) -> bool:
         """Ping host to check if alive."""
         _LOGGER.debug("ping address: %s", self._ping_host)
         try:
-            data = await async_ping(
-                host,
-                count=1,
-                timeout=1,
-                privileged=self._icmp_privileged,
-            )
-        except NameLookupError as error:
+            return await async_ping_host(self.hass, host)
+        except HostResolveError:
             _LOGGER.info("Error resolving host: %s", self._ping_host)
             self._ping_host_reachable = False
-            raise error from None
-        return data.is_alive
+            raise
 
     async def _async_maintain_connection(self):
-        """Maintain the connection."""
-        if self._client is None:
-            self._client = AsyncModbusTcpClient(host=self._host, port=self._port, timeout=10)
-        if not self._client.connected:
-            _LOGGER.info(f"Connecting to Modbus client at {self._host}:{self._port}...")
-            try:
-                await self._client.connect()
-            except Exception as e:
-                _LOGGER.warning(f"connection error {e}")
-            if not self._client.connected:
-                _LOGGER.error(f"Failed to connect to Modbus client at {self._host}:{self._port}")
-                raise ConnectionError(f"Failed to connect to {self._host}:{self._port}")
-            _LOGGER.info(f"Connected to Modbus client at {self._host}:{self._port}")
+        """Borrow the shared connection, fails fast while the link is down."""
+        await self._connection.async_connect()
+
+    def close(self) -> None:
+        """Release the shared Modbus connection."""
+        release_connection(self.hass, self._connection, self)
 
     async def _async_update_data(self) -> dict[str, Any]:
-        """Regular poll cycle: read fresh values."""
-        _LOGGER.debug("Regular poll cycle")
-        if self._ping_host != "":
-            _LOGGER.debug("ping address: %s", self._ping_host)
+        """Regular poll cycle: read fresh values and determine which keys changed."""
+        self.changed_keys = set()
+        self.poll_stats.start_cycle()
+        self._cycle_deadline = time.monotonic() + self.update_interval.total_seconds() * CYCLE_DEADLINE_FRACTION
+        stale_before = self.stale_keys
+        data = None
+        try:
+            with self.poll_stats.timed("total"):
+                data = await self._async_poll()
+        except ConnectionError as e:
+            raise UpdateFailed(str(e)) from e
+        finally:
+            self._adapt_update_interval(data)
+        # entities of keys that became stale or fresh update their attributes
+        self.changed_keys = self._changed_since_publish(data) | (stale_before ^ self.stale_keys)
+        if data is self.inverter_data:
+            self._async_schedule_save()
+        return data
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        """Schedule the next refresh on this hub's phase of the poll interval.
+
+        The slots are anchored to the wall clock, so a hub keeps its phase
+        across reloads and hubs with different phases never poll together.
+        The slot is scheduled here instead of by the coordinator, which only
+        schedules relative to the loop time.
+        """
+        if self.update_interval is None:
+            return
+        if self.config_entry is not None and self.config_entry.pref_disable_polling:
+            return
+        interval = self.update_interval.total_seconds()
+        offset = self.poll_phase * interval
+        wall_now = time.time()
+        slot = (math.floor((wall_now + interval * STAGGER_MIN_GAP - offset) / interval) + 1) * interval + offset
+        self._next_refresh_at = self.hass.loop.time() + slot - wall_now
+        self._set_refresh_timer(
+            async_track_point_in_utc_time(self.hass, self._async_handle_slot, dt_util.utc_from_timestamp(slot))
+        )
+        self._schedule_device_info_refresh()
+
+    @callback
+    def _async_handle_slot(self, _now: datetime) -> None:
+        """Refresh in a background task, like the coordinator's own timer; setup and unload do not wait for it."""
+        self._set_refresh_timer(None)
+        if self.hass.is_stopping:
+            return
+        name = f"{DOMAIN} {self.name} refresh"
+        if self.config_entry is not None:
+            self.config_entry.async_create_background_task(self.hass, self.async_refresh(), name)
+        else:
+            self.hass.async_create_background_task(self.async_refresh(), name)
+
+    # Shim over the refresh timer of DataUpdateCoordinator, the only place the hub
+    # touches its private state. The coordinator cancels the timer in _unsub_refresh
+    # on shutdown, when the last listener goes and before it calls _schedule_refresh.
+    @callback
+    def _set_refresh_timer(self, unsub: CALLBACK_TYPE | None) -> None:
+        """Cancel the pending refresh timer and store the new one."""
+        if unsub is not None:
+            self._async_unsub_refresh()
+        self._unsub_refresh = unsub
+
+    def _refresh_timer_pending(self) -> bool:
+        """Return True if a refresh is scheduled, that is the coordinator has listeners."""
+        return self._unsub_refresh is not None
+
+    @callback
+    def _schedule_device_info_refresh(self) -> None:
+        """Read the due device info registers in the gap until the next poll."""
+        if self._device_info_task is not None and not self._device_info_task.done():
+            return
+        # only after a successful poll of the current connection, never while the inverter is offline
+        if (
+            not self.last_update_success
+            or self._liveness.offline
+            or self._identified_connects <= 0
+            or self._connection.connects != self._identified_connects
+        ):
+            return
+        if not self._device_info_due():
+            return
+        name = f"{DOMAIN} {self.name} device info"
+        if self.config_entry is not None:
+            # cancelled when the entry unloads
+            self._device_info_task = self.config_entry.async_create_background_task(
+                self.hass, self._async_refresh_device_info(), name
+            )
+        else:
+            self._device_info_task = self.hass.async_create_background_task(self._async_refresh_device_info(), name)
+
+    def _device_info_due(self) -> list[str]:
+        """Return the device info registers with a known address whose cached value expired."""
+        now = time.time()
+        registers = DEVICE_INFO_REGISTERS.get(self.inverter_type or DEFAULT_INVERTER_TYPE, {})
+        return [
+            name for name, register in registers.items()
+            if register is not None and now - self._device_info_read_at.get(name, 0) >= DEVICE_INFO_TTL
+        ]
+
+    async def _async_refresh_device_info(self) -> None:
+        """Read device info registers one by one while the next poll is far enough away.
+
+        The reads are low priority on the bus, polls of other hubs on the same
+        link go first. What is not read in this gap is read in the next one.
+        """
+        registers = DEVICE_INFO_REGISTERS.get(self.inverter_type or DEFAULT_INVERTER_TYPE, {})
+        changed = False
+        for name in self._device_info_due():
+            if self._next_refresh_at - self.hass.loop.time() < self.rtt.timeout + DEVICE_INFO_IDLE_MARGIN:
+                break
+            address, count = registers[name]
             try:
-                self._ping_host_reachable = await self._async_host_alive(
-                    self._ping_host
+                regs = await self._connection.read_holding_registers(
+                    address, count, self._unit_id, self.rtt.timeout, low_priority=True
                 )
-            except NameLookupError:
-                _LOGGER.info("Error resolving host: %s", self._ping_host)
-                self._ping_host_reachable = False
-                return {"InverterMode": "Resolve Error"}
-            if not self._ping_host_reachable:
-                return {"InverterMode": "offline"}
-        await self._async_maintain_connection()
+            except Exception as e:
+                _LOGGER.debug(f"{self.name}: could not read {name} at {address}: {e}")
+                break
+            self._device_info_read_at[name] = time.time()
+            if regs.isError():
+                # not supported by this inverter, asked again after the TTL
+                _LOGGER.debug(f"{self.name}: {name} at {address} not readable: {regs}")
+                continue
+            value = decode_string(regs.registers)
+            if not value or value == self.device_info.get(name):
+                continue
+            _LOGGER.info(f"{self.name}: {name} is {value}")
+            self.device_info[name] = value
+            changed = True
+            if name == "serial_number" and value != self.serial_number:
+                # another inverter answers, identify it on the next poll
+                self._identified_connects = -1
+        if changed:
+            self._async_update_device(
+                sw_version=self.getSoftwareVersion(self.inverter_data),
+                hw_version=self.getHardwareVersion(self.inverter_data),
+            )
+        self._async_schedule_save()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners and time the entity fan-out."""
+        with self.poll_stats.timed("fanout"):
+            super().async_update_listeners()
+        self.frame_log.record_cycle(time.time(), self.poll_stats.cycle, self.last_update_success)
+
+    def _base_interval(self) -> int:
+        """Return the configured coordinator interval in seconds."""
+        return self._fast_scan_interval if self._fast_poll else self._scan_interval
+
+    def _adapt_update_interval(self, data: dict[str, Any] | None) -> None:
+        """Poll slowly while the inverter sleeps at night and probe often around sunrise."""
+        interval = self._base_interval()
+        idle = data is None or data.get("InverterMode") in INVERTER_IDLE_MODES
+        sunrise_probe = False
+        if idle and not is_up(self.hass):
+            next_rising = get_astral_event_next(self.hass, SUN_EVENT_SUNRISE)
+            until_sunrise = (next_rising - dt_util.utcnow()).total_seconds()
+            if until_sunrise <= SUNRISE_PROBE_WINDOW:
+                sunrise_probe = True
+                interval = min(interval, SUNRISE_PROBE_INTERVAL)
+            else:
+                interval = max(interval, min(NIGHT_SCAN_INTERVAL, int(until_sunrise - SUNRISE_PROBE_WINDOW)))
+        if sunrise_probe and not self._sunrise_probe:
+            # the inverter may wake up any moment, do not wait for the ping backoff
+            self._liveness.reset_backoff()
+        self._sunrise_probe = sunrise_probe
+        if self.update_interval != timedelta(seconds=interval):
+            _LOGGER.info(f"{self.name}: poll interval set to {interval} seconds")
+            self.update_interval = timedelta(seconds=interval)
+
+    def _changed_since_publish(self, data: dict[str, Any]) -> set[str]:
+        """Return the keys whose value moved outside its deadband or is due for a forced refresh."""
+        now = time.monotonic()
+        changed = set()
+        for key in self._published.keys() | data.keys():
+            new = data.get(key)
+            if key in self._published and now - self._published_at[key] < DEFAULT_FORCE_REFRESH_INTERVAL:
+                old = self._published[key]
+                if old == new:
+                    continue
+                if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+                    absolute, relative = self._deadbands.get(key, (0, 0))
+                    if abs(new - old) <= max(absolute, relative * abs(old)) + 1e-9:
+                        continue
+            changed.add(key)
+            self._published[key] = new
+            self._published_at[key] = now
+        return changed
+
+    async def _async_poll(self) -> dict[str, Any]:
+        """Read fresh values."""
+        _LOGGER.debug("Regular poll cycle")
+        if self._ping_host:
+            now = time.monotonic()
+            if self._liveness.ping_needed(now):
+                _LOGGER.debug("ping address: %s", self._ping_host)
+                try:
+                    with self.poll_stats.timed("ping"):
+                        self._ping_host_reachable = await self._async_host_alive(
+                            self._ping_host
+                        )
+                    self._offline_state = "offline"
+                except HostResolveError:
+                    _LOGGER.info("Error resolving host: %s", self._ping_host)
+                    self._ping_host_reachable = False
+                    self._offline_state = "Resolve Error"
+                if not self._ping_host_reachable:
+                    self.poll_stats.failures["ping"] += 1
+                self._liveness.record_ping(self._ping_host_reachable, now)
+            if self._liveness.offline:
+                return {"InverterMode": self._offline_state}
         try:
-            regs = await self._client.read_holding_registers(4097, count=60)
-        except Exception as e:
-            _LOGGER.error(f"Error reading holding registers: {e}")
-            raise ConnectionError(f"Failed to connect to {self._host}:{self._port}")
-        _LOGGER.info(f"got {regs.registers} registers")
-        for offset in range(len(regs.registers)):
-            if offset in self._key_dict:
-                key = self._key_dict[offset]["key"]
-                data_type: str = self._key_dict[offset]["type"]
-                if data_type.startswith("STATUS"):
-                    q = self._client.convert_from_registers(regs.registers[offset:offset+1], self._client.DATATYPE.UINT16)
-                    t = getattr(_const, data_type)
-                    if t and q in t:
-                        self.inverter_data[key] = t[q]
-                    else:
-                        self.inverter_data[key] = f"unknown {q}"
+            data = await self._async_read_due_groups()
+        except ConnectionError:
+            self._liveness.record_failure()
+            raise
+        self._liveness.record_success(time.monotonic())
+        return data
+
+    async def _async_read_due_groups(self) -> dict[str, Any]:
+        """Read the register groups that are due."""
+        with self.poll_stats.timed("connect"):
+            await self._async_maintain_connection()
+        if self._connection.connects != self._identified_connects:
+            await self.async_determineInverterType()
+        if self._excluded_ranges and time.monotonic() >= self._layout_reprobe_at:
+            # the firmware may have changed, try the full blocks again; a rejected block is bisected again
+            _LOGGER.debug(f"{self.name}: re-probing the blocks around {sorted(self._excluded_ranges)}")
+            self._set_excluded_ranges(set())
+        if self._plan_dirty:
+            self._compile_read_plan()
+        now = time.monotonic()
+        # a group is due if its deadline falls before the next coordinator tick
+        horizon = now + self.update_interval.total_seconds() / 2
+        aggregate = self._fast_poll and self._aggregate_fast
+        stale: set[str] = set()
+        read_any = False
+        for group, plans in self._group_plans.items():
+            if self._group_next_due.get(group, 0) > horizon:
+                continue
+            for plan in plans:
+                values = None if stale else await self._async_read_plan(plan)
+                if values is None:
+                    # out of time: keep the last values, the group stays due for the next cycle
+                    stale.update(plan.keys)
+                    continue
+                read_any = True
+                self._integrate_energy(values)
+                if aggregate and group == POLL_GROUP_FAST:
+                    self._add_samples(values)
                 else:
-                    factor = self._key_dict[offset]["factor"]
-                    t = getattr(self._client.DATATYPE, data_type)
-                    data_len = t.value[1]
-                    r = self._client.convert_from_registers(regs.registers[offset:offset + data_len], t)
-                    self.inverter_data[key] = r * factor
+                    self.inverter_data.update(values)
+            if not stale:
+                self._group_next_due[group] = now + self._group_interval(group)
+        self.stale_keys = stale
+        if stale:
+            if not read_any:
+                raise ConnectionError(f"Poll cycle deadline of unit {self._unit_id} at {self._connection.key} passed")
+            _LOGGER.warning(f"{self.name}: poll cycle deadline passed, {len(stale)} values are stale")
+        if aggregate and self._next_publish <= horizon:
+            self._publish_aggregates()
+            self._next_publish = now + self._scan_interval
+        energy = self._energy.value
+        if energy is not None:
+            self.inverter_data["Total_Energy_Precise"] = energy
         return self.inverter_data
 
-    async def update_runtime_settings(self, scan_interval: int, ping_host:str | None) -> None:
-        """Update settings."""
+    def _integrate_energy(self, values: dict[str, Any]) -> None:
+        """Feed every power sample and counter reading to the energy integrator."""
+        if "Total_Energy" in values:
+            self._energy.sync(values["Total_Energy"])
+        if "Active_Power" in values:
+            self._energy.add_power(time.monotonic(), values["Active_Power"])
+
+    def _add_samples(self, values: dict[str, Any]) -> None:
+        """Collect numeric fast values for the next publish, pass status values on."""
+        for key, value in values.items():
+            if isinstance(value, (int, float)):
+                window = self._windows.get(key)
+                if window is None:
+                    window = self._windows[key] = SampleWindow()
+                window.add(value)
+            else:
+                self.inverter_data[key] = value
+
+    def _publish_aggregates(self) -> None:
+        """Publish the mean of the collected samples, keep min and max for the attributes."""
+        for key, window in self._windows.items():
+            if not len(window):
+                continue
+            mean, low, high = window.summary()
+            self.inverter_data[key] = mean
+            self.aggregates[key] = {"min": low, "max": high, "samples": len(window)}
+            window.clear()
+
+    async def _async_read_plan(self, plan: RegisterDecodePlan) -> dict[str, Any] | None:
+        """Read a planned block, bisect it if the inverter rejects its address range; None if the cycle deadline passed.
+
+        A sensor rejected on its own, or a non-empty gap between two halves
+        that are read fine on their own, becomes an excluded range; the read
+        plan then goes around it. One bad register costs only its own value.
+        Ranges are only learned if a part of the block could be read, and
+        never cover a required key; otherwise the rejection fails the read.
+        """
+        try:
+            return await self._async_read_block(plan)
+        except RejectedReadError as e:
+            rejection = e
+        excluded: set[tuple[int, int]] = set()
+        values = await self._async_bisect(plan, excluded)
+        if values is None:
+            return None
+        if not values:
+            raise ConnectionError(
+                f"Unit {self._unit_id} at {self._connection.key} rejects every read of"
+                f" registers {plan.start}-{plan.start + plan.count - 1}: {rejection}"
+            )
+        for start, end in sorted(excluded):
+            _LOGGER.warning(f"{self.name}: inverter rejects reads of registers {start}-{end - 1}, reading around them")
+        if excluded:
+            self._set_excluded_ranges(self._excluded_ranges | excluded)
+        return values
+
+    async def _async_bisect(
+        self, plan: RegisterDecodePlan, excluded: set[tuple[int, int]]
+    ) -> dict[str, Any] | None:
+        """Read the halves of a rejected block, add the ranges found rejected to excluded."""
+        halves = split_plan(self._key_dict, plan)
+        if halves is None:
+            if self._covers_required_key(plan.start, plan.start + plan.count):
+                raise ConnectionError(f"Unit {self._unit_id} at {self._connection.key} rejects reads of {plan.keys}")
+            excluded.add((plan.start, plan.start + plan.count))
+            return {}
+        found = len(excluded)
+        values: dict[str, Any] = {}
+        # the half with a required key first: if the inverter rejects everything that fails fast
+        for half in sorted(halves, key=lambda half: not self._covers_required_key(half.start, half.start + half.count)):
+            try:
+                part = await self._async_read_block(half)
+            except RejectedReadError:
+                part = await self._async_bisect(half, excluded)
+            if part is None:
+                return None
+            values.update(part)
+        gap = (halves[0].start + halves[0].count, halves[1].start)
+        # both halves are fine: the rejected register lies between them; no gap means the rejection was transient
+        if len(excluded) == found and gap[0] < gap[1] and not self._covers_required_key(*gap):
+            excluded.add(gap)
+        return values
+
+    def _covers_required_key(self, start: int, end: int) -> bool:
+        """Return True if the register range overlaps a key the hub always reads."""
+        return any(
+            offset < end and offset + register_length(entry["type"]) > start
+            for offset, entry in self._key_dict.items()
+            if entry["key"] in REQUIRED_KEYS
+        )
+
+    def _set_excluded_ranges(self, excluded: set[tuple[int, int]]) -> None:
+        """Replace the rejected register ranges and recompile the read plan before the next poll."""
+        self._excluded_ranges = excluded
+        self._layout_reprobe_at = time.monotonic() + LAYOUT_REPROBE_INTERVAL
+        self._plan_dirty = True
+
+    async def _async_read_block(self, plan: RegisterDecodePlan) -> dict[str, Any] | None:
+        """Read one register block and decode it, None if the cycle deadline passed.
+
+        The request timeout follows the round trip times; a timed out request
+        is retried REQUEST_RETRIES times within the cycle deadline. The
+        deadline bounds the whole turn, the wait for the bus and the connect
+        included; a request cut short by it is not a link failure.
+        """
+        address = REGISTER_BASE_ADDRESS + plan.start
+        for attempt in range(REQUEST_RETRIES + 1):
+            remaining = self._cycle_deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            timeout = self.rtt.timeout
+            try:
+                with self.poll_stats.timed("read"):
+                    async with asyncio.timeout(remaining) as cycle_timeout:
+                        regs, rtt = await self._connection.read_holding_registers_timed(
+                            address, plan.count, self._unit_id, timeout
+                        )
+                    if regs.isError():
+                        if getattr(regs, "exception_code", None) == ILLEGAL_DATA_ADDRESS:
+                            raise RejectedReadError(f"{regs}")
+                        raise ConnectionError(f"{regs}")
+                    if len(regs.registers) != plan.count:
+                        # a gateway may cut the frame short, decoding it would fail
+                        raise ConnectionError(f"got {len(regs.registers)} of {plan.count} registers")
+            except TimeoutError:
+                if cycle_timeout.expired():
+                    return None
+                self.rtt.backoff()
+                _LOGGER.debug(f"{self.name}: no answer at {address} within {timeout:.2f}s, attempt {attempt + 1}")
+                continue
+            except (CircuitOpenError, RejectedReadError):
+                raise
+            except Exception as e:
+                # reported once by the coordinator as UpdateFailed, not on every poll of a sleeping inverter
+                _LOGGER.debug(f"{self.name}: error reading holding registers at {address}: {e}")
+                raise ConnectionError(f"Failed to read unit {self._unit_id} at {self._connection.key}")
+            break
+        else:
+            _LOGGER.debug(f"{self.name}: no answer at {address} after {REQUEST_RETRIES + 1} attempts")
+            raise ConnectionError(f"Failed to read unit {self._unit_id} at {self._connection.key}")
+        self.rtt.add(rtt)
+        _LOGGER.debug(f"got {regs.registers} registers at {address}")
+        self.frame_log.record_frame(time.time(), address, regs.registers, rtt)
+        with self.poll_stats.timed("decode"):
+            return plan.decode(regs.registers)
+
+    def _group_interval(self, group: str) -> int:
+        """Return the poll interval of a register group in seconds."""
+        if group == POLL_GROUP_FAST and self._fast_poll:
+            return self._fast_scan_interval
+        return self._scan_interval
+
+    async def update_runtime_settings(self, scan_interval: int, ping_host:str | None,
+                                      fast_poll: bool = DEFAULT_FAST_POLL,
+                                      fast_scan_interval: int = DEFAULT_FAST_SCAN_INTERVAL,
+                                      aggregate_fast: bool = DEFAULT_AGGREGATE_FAST) -> None:
+        """Apply changed options in place, the next poll already uses them."""
         _LOGGER.info("Update settings")
         self._scan_interval = scan_interval
+        if ping_host != self._ping_host:
+            self._liveness.reset_backoff()
         self._ping_host = ping_host
+        self._fast_poll = fast_poll
+        self._fast_scan_interval = fast_scan_interval
+        if not (fast_poll and aggregate_fast):
+            self._windows.clear()
+            self.aggregates.clear()
+        self._aggregate_fast = aggregate_fast
+        if self._key_dict:
+            self.set_key_dict(self._key_dict)
+        # the group deadlines were computed with the old intervals
+        self._group_next_due.clear()
+        self._reschedule()
 
-    async def reconfigure_connection_settings(self, host: str, port: int, scan_interval: int, ping_host:str | None) -> None:
-        """Update settings."""
-        _LOGGER.info("Update settings")
+    async def reconfigure_connection_settings(self, host: str, port: int, unit_id: int,
+                                              transport: str = DEFAULT_TRANSPORT,
+                                              baudrate: int = DEFAULT_BAUDRATE) -> None:
+        """Switch to another gateway, unit or transport; the connection is kept if the link is unchanged."""
+        _LOGGER.info("Update connection settings")
+        if (host, port, transport, baudrate) != (self._host, self._port, self._transport, self._baudrate):
+            # release first: a connection nobody else uses is closed, not reused with the old settings
+            release_connection(self.hass, self._connection, self)
+            self._connection = get_connection(self.hass, host, port, self, transport, baudrate)
+            self.rtt = RttEstimator()
+        elif unit_id == self._unit_id:
+            return
         self._host = host
         self._port = port
-        self._scan_interval = scan_interval
-        self._ping_host = ping_host
+        self._transport = transport
+        self._baudrate = baudrate
+        self._unit_id = unit_id
+        # another device may answer now, check its identity on the next poll
+        self._identified_connects = -1
+        self._device_info_read_at.clear()
+        self._group_next_due.clear()
+        self._liveness.reset_backoff()
+
+    @callback
+    def _reschedule(self) -> None:
+        """Apply a changed poll interval to the pending refresh."""
+        self._adapt_update_interval(self.data)
+        if self._refresh_timer_pending():
+            self._schedule_refresh()
 
     def set_key_dict(self, key_dict):
-        """Set mapping between register position and variable."""
+        """Set mapping between register position and variable and compile the read plan."""
         self._key_dict = key_dict
+        self._deadbands = {
+            entry["key"]: (entry.get("deadband", 0), entry.get("deadband_relative", 0))
+            for entry in key_dict.values()
+        }
+        self._compile_read_plan()
 
-    async def async_determineInverterType(self, hub, configdict):
-        """Get the Inverter type."""
-        _LOGGER.info(f"{hub.name}: trying to determine SolarMax inverter type")
+    def decode_frame(self, address: int, registers: list[int]) -> dict[str, Any] | None:
+        """Decode a raw frame with the current read plan, None if no plan reads that block."""
+        for plans in self._group_plans.values():
+            for plan in plans:
+                if REGISTER_BASE_ADDRESS + plan.start == address and plan.count == len(registers):
+                    return plan.decode(registers)
+        return None
 
-        try:
-            await self._async_maintain_connection()
-            # Lese Seriennummer von Register 6672-6678 (7 Register)
-            sn_data = await self._client.read_holding_registers(6672, count=7)
-            #sn_data = await hub.async_read_holding_registers(unit=hub._modbus_addr, address=6672, count=7)
+    def enable_key(self, key: str) -> None:
+        """Register an enabled entity; its registers are read from the next poll on."""
+        if key not in self._enabled_keys:
+            self._enabled_keys.add(key)
+            self._plan_dirty = True
 
-            if sn_data.isError():
-                _LOGGER.error(f"{hub.name}: could not read serial number from address 6672-6678. Please check connection and Modbus address.")
-                return 0
-
-            # Dekodiere Seriennummer: Register enthalten 16-bit Werte, die zu ASCII konvertiert werden müssen
-            seriesnumber = ""
-            _LOGGER.debug(f"{hub.name}: Raw register values: {sn_data.registers}")
-
-            for register_value in sn_data.registers:
-                if register_value > 0:  # Nur wenn Wert > 0
-                    # Versuche verschiedene Dekodierungsmethoden
-                    try:
-                        # Methode 1: High-Byte und Low-Byte einzeln
-                        high_byte = (register_value >> 8) & 0xFF
-                        low_byte = register_value & 0xFF
-
-                        if high_byte > 0 and high_byte < 128:  # Gültiger ASCII-Bereich
-                            seriesnumber += chr(high_byte)
-                        if low_byte > 0 and low_byte < 128:  # Gültiger ASCII-Bereich
-                            seriesnumber += chr(low_byte)
-
-                    except Exception as e:
-                        _LOGGER.debug(f"{hub.name}: Error converting register {register_value}: {e}")
-                        # Fallback: Direkte Konvertierung falls Wert im ASCII-Bereich
-                        if 32 <= register_value <= 126:  # Druckbare ASCII-Zeichen
-                            seriesnumber += chr(register_value)
-
-            seriesnumber = seriesnumber.strip()  # Entferne eventuelle Leerzeichen
-            hub.seriesnumber = seriesnumber
-            _LOGGER.info(f"{hub.name}: Inverter serial number: {seriesnumber}")
-
-            # Überprüfe ob es sich um einen SolarMax/SunWay Inverter handelt
-            if seriesnumber and len(seriesnumber) > 0:
-                # Spezielle Behandlung für bekannte Seriennummern
-                if seriesnumber == "2245-211303511":
-                    self.inverter_model = "SolarMax 6SMT"
-                    _LOGGER.info(f"{hub.name}: Detected known SolarMax 6SMT with SN: {seriesnumber}")
-                elif seriesnumber.startswith("2245-"):
-                    self.inverter_model = f"SolarMax 6SMT-{seriesnumber[-6:]}"
-                    _LOGGER.info(f"{hub.name}: Detected SolarMax 6SMT series with SN: {seriesnumber}")
-                else:
-                    self.inverter_model = f"SolarMax-{seriesnumber}"
-                    _LOGGER.info(f"{hub.name}: Detected SolarMax inverter with SN: {seriesnumber}")
-                return "SOLARMAX_6SMT_10KTL"
-            else:
-                # Falls Seriennummer leer ist, aber Verbindung funktioniert, akzeptiere trotzdem
-                _LOGGER.warning(f"{hub.name}: Serial number is empty, but trying to proceed as SolarMax inverter")
-                self.inverter_model = "SolarMax-Unknown"
-                return "SOLARMAX_6SMT_10KTL"
+    def disable_key(self, key: str) -> None:
+        """Unregister an entity that was disabled or removed."""
+        if key in self._enabled_keys:
+            self._enabled_keys.discard(key)
+            self._plan_dirty = True
+
+    def _compile_read_plan(self) -> None:
+        """Plan the block reads of every poll group for the enabled keys."""
+        self._plan_dirty = False
+        groups: dict[str, dict] = {}
+        for offset, entry in self._key_dict.items():
+            group = entry.get("poll_group", POLL_GROUP_SLOW) if self._fast_poll else POLL_GROUP_SLOW
+            groups.setdefault(group, {})[offset] = entry
+        keys = self._enabled_keys.union(REQUIRED_KEYS)
+        for key in self._enabled_keys.intersection(DERIVED_KEYS):
+            keys.update(DERIVED_KEYS[key])
+        self._group_plans = {}
+        for group, entries in groups.items():
+            plans = plan_reads(entries, keys, excluded=self._excluded_ranges)
+            if plans:
+                self._group_plans[group] = plans
+            _LOGGER.debug(f"{self.name}: poll group {group} reads {[(p.start, p.count) for p in plans]}")
+        self._group_next_due = {
+            group: due for group, due in self._group_next_due.items() if group in self._group_plans
+        }
 
+    async def async_determineInverterType(self) -> str | None:
+        """Read the serial number and return the inverter type, None if it cannot be read.
+
+        Runs once per new connection. Serial number, model and type are cached
+        in the config entry and the device registry, so normal polls do not
+        read them. The type selects the register map; if it changes the
+        entry is reloaded.
+        """
+        self._identified_connects = self._connection.connects
+        try:
+            sn_data = await self._connection.read_holding_registers(
+                SERIAL_NUMBER_ADDRESS, SERIAL_NUMBER_COUNT, self._unit_id, self.rtt.timeout
+            )
+            if sn_data.isError():
+                raise ConnectionError(f"{sn_data}")
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            _LOGGER.error(f"{hub.name}: Error determining inverter type: {e}")
-            # Selbst bei Fehlern, versuche als SolarMax zu behandeln
-            _LOGGER.info(f"{hub.name}: Treating as SolarMax inverter despite detection error")
-            self.inverter_model = "SolarMax-Fallback"
-            return "SOLARMAX_6SMT_10KTL"
+            _LOGGER.warning(f"{self.name}: could not read the serial number at {SERIAL_NUMBER_ADDRESS}: {e}")
+            return None
+        serial_number = decode_string(sn_data.registers)
+        if not serial_number:
+            _LOGGER.warning(f"{self.name}: inverter reports an empty serial number {sn_data.registers}")
+            return None
+        self.device_info["serial_number"] = serial_number
+        self._device_info_read_at["serial_number"] = time.time()
+        inverter_type, model = next(
+            (found for prefix, found in SERIAL_PREFIX_MODELS.items() if serial_number.startswith(prefix)),
+            (DEFAULT_INVERTER_TYPE, DEFAULT_MODEL),
+        )
+        if serial_number != self.serial_number or inverter_type != self.inverter_type:
+            if self.serial_number is not None and serial_number != self.serial_number:
+                _LOGGER.warning(f"{self.name}: serial number changed from {self.serial_number} to {serial_number}")
+                # the rejected ranges were learned from the other inverter
+                self._set_excluded_ranges(set())
+            register_map_changed = inverter_type != (self.inverter_type or DEFAULT_INVERTER_TYPE)
+            self.serial_number = serial_number
+            self.inverter_model = model
+            self.inverter_type = inverter_type
+            _LOGGER.info(f"{self.name}: detected {model} ({inverter_type}) with serial number {serial_number}")
+            self._async_store_identity()
+            if register_map_changed and self.config_entry is not None:
+                # the sensors are built from the register map of the type, set them up again
+                self.hass.config_entries.async_schedule_reload(self.config_entry.entry_id)
+        return inverter_type
+
+    @callback
+    def _async_store_identity(self) -> None:
+        """Cache serial number and model in the config entry and update the device."""
+        entry = self.config_entry
+        if entry is None:
+            return
+        self.hass.config_entries.async_update_entry(
+            entry,
+            data={
+                **entry.data,
+                CONF_SERIAL_NUMBER: self.serial_number,
+                CONF_MODEL: self.inverter_model,
+                CONF_INVERTER_TYPE: self.inverter_type,
+            },
+        )
+        self._async_update_device(serial_number=self.serial_number, model=self.inverter_model)
+
+    @callback
+    def _async_update_device(self, **changes: str | None) -> None:
+        """Update the device registry entry of the hub with the changes that are not None."""
+        changes = {attribute: value for attribute, value in changes.items() if value is not None}
+        if self.config_entry is None or not changes:
+            return
+        device_registry = dr.async_get(self.hass)
+        device = device_registry.async_get_device(identifiers={(DOMAIN, self.config_entry.data[CONF_NAME])})
+        if device is not None:
+            device_registry.async_update_device(device.id, **changes)
 
     def matchInverterWithMask(self, inverterspec, entitymask, serialnumber="not relevant", blacklist=None):
         return (inverterspec & entitymask) != 0
 
     def getSoftwareVersion(self, new_data):
-        raw_version = new_data.get("firmware_version")
+        raw_version = new_data.get("firmware_version", self.device_info.get("firmware_version"))
         if raw_version is not None:
              return str(raw_version)
         return None
 
     def getHardwareVersion(self, new_data):
+        raw_version = new_data.get("hardware_version", self.device_info.get("hardware_version"))
+        if raw_version is not None:
+            return str(raw_version)
         return None
@@ -0,0 +1,62 @@
+"""Track whether an inverter is alive without pinging it before every poll."""
+
+from __future__ import annotations
+
+from .const import LIVENESS_IDLE_TIMEOUT, PING_BACKOFF_INITIAL, PING_BACKOFF_MAX
+
+
+class LivenessTracker:
+    """Decide when the ping host has to be checked.
+
+    A successful Modbus transaction proves the inverter is alive, so a ping
+    is only needed after a failed transaction or when the last success is
+    older than idle_timeout. While the host does not answer pings the next
+    ping is delayed with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = LIVENESS_IDLE_TIMEOUT,
+        backoff_initial: float = PING_BACKOFF_INITIAL,
+        backoff_max: float = PING_BACKOFF_MAX,
+    ) -> None:
+        """Initialize the tracker."""
+        self._idle_timeout = idle_timeout
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._backoff = backoff_initial
+        self._last_success: float | None = None
+        self._next_ping = 0.0
+        self.offline = False
+
+    def ping_needed(self, now: float) -> bool:
+        """Return True if the host has to be pinged before the next Modbus request."""
+        if self.offline:
+            return now >= self._next_ping
+        return self._last_success is None or now - self._last_success > self._idle_timeout
+
+    def record_success(self, now: float) -> None:
+        """Record a successful Modbus transaction."""
+        self._last_success = now
+        self._backoff = self._backoff_initial
+        self.offline = False
+
+    def record_failure(self) -> None:
+        """Record a failed Modbus transaction, the next poll pings first."""
+        self._last_success = None
+
+    def record_ping(self, alive: bool, now: float) -> None:
+        """Record the result of a ping."""
+        if alive:
+            self.offline = False
+            self._backoff = self._backoff_initial
+            return
+        self.offline = True
+        self._last_success = None
+        self._next_ping = now + self._backoff
+        self._backoff = min(self._backoff * 2, self._backoff_max)
+
+    def reset_backoff(self) -> None:
+        """Ping again on the next poll."""
+        self._next_ping = 0.0
+        self._backoff = self._backoff_initial
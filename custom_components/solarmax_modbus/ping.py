@@ -0,0 +1,75 @@
+"""ICMP liveness checks of the ping host.
+
+icmplib is imported and the socket privileges are probed only when the
+first entry with a ping host polls. Both are cached for the whole process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from types import ModuleType
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.importlib import async_import_module
+
+_LOGGER = logging.getLogger(__name__)
+
+_UNPROBED = object()
+_icmplib: ModuleType | None = None
+_privileged: bool | None | object = _UNPROBED
+_probe_lock = asyncio.Lock()
+
+
+class HostResolveError(Exception):
+    """The ping host name could not be resolved."""
+
+
+async def _async_icmplib(hass: HomeAssistant) -> ModuleType:
+    """Import icmplib without blocking the event loop."""
+    global _icmplib
+    if _icmplib is None:
+        _icmplib = await async_import_module(hass, "icmplib")
+    return _icmplib
+
+
+async def async_icmp_privileged(hass: HomeAssistant) -> bool | None:
+    """Return the privileged mode icmplib can use, None if it cannot ping at all."""
+    global _privileged
+    if _privileged is _UNPROBED:
+        async with _probe_lock:
+            if _privileged is _UNPROBED:
+                _privileged = await _can_use_icmp_lib_with_privilege(await _async_icmplib(hass))
+    return _privileged  # type: ignore[return-value]
+
+
+async def async_ping_host(hass: HomeAssistant, host: str) -> bool:
+    """Ping host once, raise HostResolveError if the name does not resolve."""
+    icmplib = await _async_icmplib(hass)
+    privileged = await async_icmp_privileged(hass)
+    try:
+        data = await icmplib.async_ping(host, count=1, timeout=1, privileged=privileged)
+    except icmplib.NameLookupError as error:
+        raise HostResolveError(host) from error
+    return data.is_alive
+
+
+async def _can_use_icmp_lib_with_privilege(icmplib: ModuleType) -> bool | None:
+    """Verify we can create a raw socket."""
+    try:
+        await icmplib.async_ping("127.0.0.1", count=0, timeout=0, privileged=True)
+    except icmplib.SocketPermissionError:
+        try:
+            await icmplib.async_ping("127.0.0.1", count=0, timeout=0, privileged=False)
+        except icmplib.SocketPermissionError:
+            _LOGGER.info(
+                "Cannot use icmplib because privileges are insufficient to create the"
+                " socket"
+            )
+            return None
+
+        _LOGGER.info("Using icmplib in privileged=False mode")
+        return False
+
+    _LOGGER.info("Using icmplib in privileged=True mode")
+    return True
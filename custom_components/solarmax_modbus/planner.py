@@ -0,0 +1,69 @@
+"""Plan the register reads needed for the enabled SolarMax sensors."""
+
+from __future__ import annotations
+
+from collections.abc import Collection
+from typing import Any
+
+from .const import MAX_READ_REGISTERS, READ_REQUEST_COST
+from .decoder import RegisterDecodePlan, register_length
+
+
+def plan_reads(
+    key_dict: dict[int, dict[str, Any]],
+    keys: Collection[str] | None = None,
+    request_cost: int = READ_REQUEST_COST,
+    max_count: int = MAX_READ_REGISTERS,
+    excluded: Collection[tuple[int, int]] = (),
+) -> list[RegisterDecodePlan]:
+    """Return the cheapest set of block reads covering the requested keys.
+
+    The cost of a plan is counted in registers: every request costs
+    request_cost (the round trip), every register transferred costs one.
+    Two neighbouring ranges are therefore read in one request when the gap
+    between them is smaller than a round trip, as long as the merged block
+    fits into max_count registers (one Modbus PDU).
+
+    excluded are register ranges (start, end) the inverter rejects: sensors
+    overlapping them are not read and no block spans or touches them.
+    """
+    wanted = {
+        offset: entry for offset, entry in key_dict.items()
+        if (keys is None or entry["key"] in keys)
+        and not any(offset < end and offset + register_length(entry["type"]) > start for start, end in excluded)
+    }
+    blocks: list[list[int]] = []
+    for offset in sorted(wanted):
+        end = offset + register_length(wanted[offset]["type"])
+        if blocks:
+            start, last = blocks[-1]
+            if (
+                offset - last < request_cost
+                and end - start <= max_count
+                and not any(low <= offset and high >= last for low, high in excluded)
+            ):
+                blocks[-1][1] = max(last, end)
+                continue
+        blocks.append([offset, end])
+    return [RegisterDecodePlan(wanted, start, end - start) for start, end in blocks]
+
+
+def split_plan(
+    key_dict: dict[int, dict[str, Any]], plan: RegisterDecodePlan
+) -> tuple[RegisterDecodePlan, RegisterDecodePlan] | None:
+    """Split a block read into two reads of half its sensors each, None if it reads a single sensor."""
+    keys = set(plan.keys)
+    entries = {
+        offset: entry for offset, entry in key_dict.items()
+        if entry["key"] in keys and plan.start <= offset < plan.start + plan.count
+    }
+    if len(entries) < 2:
+        return None
+    offsets = sorted(entries)
+    middle = len(offsets) // 2
+    halves = []
+    for part in (offsets[:middle], offsets[middle:]):
+        wanted = {offset: entries[offset] for offset in part}
+        end = max(offset + register_length(entry["type"]) for offset, entry in wanted.items())
+        halves.append(RegisterDecodePlan(wanted, part[0], end - part[0]))
+    return halves[0], halves[1]
@@ -0,0 +1,55 @@
+"""Request timeouts derived from the observed round trip times."""
+
+from __future__ import annotations
+
+from .const import REQUEST_TIMEOUT_INITIAL, REQUEST_TIMEOUT_MAX, REQUEST_TIMEOUT_MIN
+
+# gains and variance factor of RFC 6298
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+RTT_K = 4
+
+
+class RttEstimator:
+    """Compute a request timeout from smoothed RTT and RTT variance, like TCP's retransmit timeout.
+
+    timeout = srtt + 4 * rttvar, clamped to [minimum, maximum]. A timed out
+    request doubles the timeout until the next answered request.
+    """
+
+    __slots__ = ("srtt", "rttvar", "timeout", "_minimum", "_maximum")
+
+    def __init__(
+        self,
+        initial: float = REQUEST_TIMEOUT_INITIAL,
+        minimum: float = REQUEST_TIMEOUT_MIN,
+        maximum: float = REQUEST_TIMEOUT_MAX,
+    ) -> None:
+        """Initialize the estimator."""
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.timeout = initial
+        self._minimum = minimum
+        self._maximum = maximum
+
+    def add(self, rtt: float) -> None:
+        """Add the round trip time of an answered request in seconds."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * rtt
+        self.timeout = min(self._maximum, max(self._minimum, self.srtt + RTT_K * self.rttvar))
+
+    def backoff(self) -> None:
+        """Double the timeout after a request timed out."""
+        self.timeout = min(self._maximum, self.timeout * 2)
+
+    def as_dict(self) -> dict[str, float | None]:
+        """Return the estimate in ms."""
+        return {
+            "srtt": round(self.srtt * 1000, 1) if self.srtt is not None else None,
+            "rttvar": round(self.rttvar * 1000, 1),
+            "timeout": round(self.timeout * 1000, 1),
+        }
@@ -0,0 +1,119 @@
+"""Bus time scheduling for several inverters on one Modbus link."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+# bits per RTU character: start, 8 data, parity or second stop, stop
+RTU_CHARACTER_BITS = 11
+
+
+def rtu_frame_gap(baudrate: int) -> float:
+    """Return the silent interval between two RTU frames (3.5 characters) in seconds."""
+    if baudrate > 19200:
+        # fixed value the Modbus serial line spec recommends for high baud rates
+        return 0.00175
+    return 3.5 * RTU_CHARACTER_BITS / baudrate
+
+
+class BusScheduler:
+    """Hand a shared bus to one request at a time, round-robin over the unit ids.
+
+    Every unit id has its own queue. When the bus becomes free it goes to the
+    next unit in the rotation, so an inverter with many block reads cannot
+    starve the others behind the same gateway or on the same RS485 line.
+    Low priority requests only get the bus when no other request waits.
+    Before a request starts the scheduler keeps the bus silent for
+    inter_frame_gap seconds after the previous one.
+    """
+
+    def __init__(self, inter_frame_gap: float = 0.0) -> None:
+        """Initialize the scheduler."""
+        self.inter_frame_gap = inter_frame_gap
+        self._queues: dict[int, deque[asyncio.Future[None]]] = {}
+        self._rotation: deque[int] = deque()
+        self._background: deque[asyncio.Future[None]] = deque()
+        self._busy = False
+        self._released_at = 0.0
+        # seconds the bus was in use, for utilization statistics
+        self.busy_time = 0.0
+
+    @asynccontextmanager
+    async def turn(self, unit_id: int, low_priority: bool = False) -> AsyncIterator[None]:
+        """Wait for the turn of unit_id and hold the bus for one transaction."""
+        await self._async_acquire(unit_id, low_priority)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            yield
+        finally:
+            self.busy_time += loop.time() - start
+            self._release()
+
+    async def _async_acquire(self, unit_id: int, low_priority: bool) -> None:
+        """Wait until the bus is granted to this request."""
+        loop = asyncio.get_running_loop()
+        if self._busy or self._rotation or self._background:
+            waiter: asyncio.Future[None] = loop.create_future()
+            if low_priority:
+                self._background.append(waiter)
+            else:
+                queue = self._queues.setdefault(unit_id, deque())
+                queue.append(waiter)
+                if unit_id not in self._rotation:
+                    self._rotation.append(unit_id)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # granted while being cancelled, pass the bus on
+                    self._release()
+                else:
+                    self._discard(unit_id, waiter)
+                raise
+        else:
+            self._busy = True
+        delay = self._released_at + self.inter_frame_gap - loop.time()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release()
+                raise
+
+    def _discard(self, unit_id: int, waiter: asyncio.Future[None]) -> None:
+        """Remove a cancelled waiter."""
+        if waiter in self._background:
+            self._background.remove(waiter)
+            return
+        queue = self._queues.get(unit_id)
+        if queue is None:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[unit_id]
+            self._rotation.remove(unit_id)
+
+    def _release(self) -> None:
+        """Give the bus to the next unit in the rotation."""
+        self._released_at = asyncio.get_running_loop().time()
+        while self._rotation:
+            unit_id = self._rotation.popleft()
+            queue = self._queues[unit_id]
+            waiter = queue.popleft()
+            if queue:
+                self._rotation.append(unit_id)
+            else:
+                del self._queues[unit_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        while self._background:
+            waiter = self._background.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._busy = False
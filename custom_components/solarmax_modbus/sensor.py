@@ -1,171 +1,150 @@
 
+import time
 from dataclasses import dataclass
+from functools import cache
+from types import MappingProxyType
+from typing import Any, Mapping
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from .const import DOMAIN, line_sensor, pv_sensor, energy_sensor, power_sensors
+from .const import (
+    DOMAIN,
+    DEFAULT_INVERTER_TYPE,
+    POLL_GROUP_SLOW,
+    REGISTER_MAPS,
+    POLL_STATS_DEADBAND_RELATIVE,
+    POLL_STATS_WRITE_INTERVAL,
+)
+from .decoder import register_length
 from .hub import SolarMaxModbusHub
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.sensor import SensorEntity, SensorStateClass
 import logging
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntityDescription
-from homeassistant.const import UnitOfPower, UnitOfTemperature
+from homeassistant.const import EntityCategory, UnitOfEnergy, UnitOfTime
+from .stats import POLL_PHASES
 
 
 _LOGGER = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(frozen=True, kw_only=True)
 class SolarMaxSensorEntityDescription(SensorEntityDescription):
     """A class that describes SolarMax sensor entities."""
     factor: float = 1
     position: float = 0
     data_type: str = ""
+    deadband: float = 0
+    deadband_relative: float = 0
+    poll_group: str = POLL_GROUP_SLOW
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-    """Set up SolarMax sensors from a config entry."""
-    hub: SolarMaxModbusHub = hass.data[DOMAIN][entry.entry_id]["hub"]
-    device_info = hass.data[DOMAIN][entry.entry_id]["device_info"]
-    entities = []
-    offset = 0
-    key_dict = {}
-    for i in range(3):
-        for sens in line_sensor:
-        # {"name": "Voltage",   "type": "uint16", "factor":  0.1,
-        #  "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
-        #  "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
-            sensor_key = f"L{i+1}{sens["name"]}"
-            sensor = SolarMaxSensorEntityDescription(
-                name=f"L{i+1} {sens["name"]}",
-                key=sensor_key,
-                native_unit_of_measurement=sens["unit"],
-                icon=sens["icon"],
-                device_class=sens["device_class"],
-                state_class=SensorStateClass.MEASUREMENT,
-                entity_registry_enabled_default=True,
-                factor=sens["factor"],
-                data_type=sens["type"]
-            )
-            entity = SolarMaxSensor(hub, device_info, sensor)
-            entities.append(entity)
-            key_dict[offset] = {"key": sensor_key, "type": sens["type"], "factor": sens["factor"]}
-            offset += 1
-            if str(sens["type"]).endswith("32"):
-                offset += 1
-            elif str(sens["type"]).endswith("64"):
-                offset += 3
-    for i in range(3):
-        for sens in pv_sensor:
-        # {"name": "Voltage",   "type": "uint16", "factor":  0.1,
-        #  "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
-        #  "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
-            sensor_key = f"PV{i+1}{sens["name"]}"
-            sensor = SolarMaxSensorEntityDescription(
-                name=f"PV{i+1} {sens["name"]}",
-                key=sensor_key,
-                native_unit_of_measurement=sens["unit"],
-                icon=sens["icon"],
-                device_class=sens["device_class"],
-                state_class=SensorStateClass.MEASUREMENT,
-                entity_registry_enabled_default=True,
-                factor=sens["factor"],
-                data_type=sens["type"]
-            )
-            entity = SolarMaxSensor(hub, device_info, sensor)
-            entities.append(entity)
-            key_dict[offset] = {"key": sensor_key, "type": sens["type"], "factor": sens["factor"]}
-            offset += 1
-            if str(sens["type"]).endswith("32"):
-                offset += 1
-            elif str(sens["type"]).endswith("64"):
-                offset += 3
-
-    sensor_key = "Temperature"
-    sensor = SolarMaxSensorEntityDescription(
-        name="Temperature",
-        key=sensor_key,
-        icon="mdi:thermometer",
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+@dataclass(frozen=True, kw_only=True)
+class SolarMaxDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """A class that describes the poll statistics sensors of a hub."""
+    phase: str = "total"
+    failures: bool = False
+
+
+_PHASE_NAMES = {
+    "ping": "Ping time",
+    "connect": "Connect time",
+    "read": "Read time",
+    "decode": "Decode time",
+    "fanout": "Entity update time",
+    "total": "Poll time",
+}
+
+# sensors the hub computes from register values, see DERIVED_KEYS
+DERIVED_SENSORS = [
+    SolarMaxSensorEntityDescription(
+        name="Total Energy Precise",
+        key="Total_Energy_Precise",
+        icon="mdi:solar-power",
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=3,
         entity_registry_enabled_default=True,
-        data_type="UINT16"
+    ),
+]
+
+DIAGNOSTIC_SENSORS = [
+    SolarMaxDiagnosticSensorEntityDescription(
+        name=_PHASE_NAMES[phase],
+        key=f"poll_{phase}_time",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        phase=phase,
     )
-    entity = SolarMaxSensor(hub, device_info, sensor)
-    entities.append(entity)
-    key_dict[offset] = {"key": sensor_key, "type": "UINT16", "factor": 1}
-    offset += 1
-
-    sensor_key = "InverterMode"
-    sensor = SolarMaxSensorEntityDescription(
-        name="Inverter Mode",
-        key=sensor_key,
-        icon="mdi:information-outline",
-        entity_registry_enabled_default=True,
-        data_type="STATUS_INVERTER_MODE"
+    for phase in POLL_PHASES
+] + [
+    SolarMaxDiagnosticSensorEntityDescription(
+        name="Poll failures",
+        key="poll_failures",
+        icon="mdi:alert-circle-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        failures=True,
     )
-    entity = SolarMaxSensor(hub, device_info, sensor)
-    entities.append(entity)
-    key_dict[offset] = {"key": sensor_key, "type": "STATUS_INVERTER_MODE", "factor": 1}
-    offset += 1
-
-    offset += 3 # skip 3 byte
-
-    for sens in energy_sensor:
-    # {"name": "Voltage",   "type": "uint16", "factor":  0.1,
-    #  "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
-    #  "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
-        sensor_key = sens["name"].replace(" ", "_")
-        sensor = SolarMaxSensorEntityDescription(
-            name=sens["name"],
-            key=sensor_key,
-            native_unit_of_measurement=sens["unit"],
-            icon=sens["icon"],
-            device_class=sens["device_class"],
-            state_class=sens["state_class"],
-            entity_registry_enabled_default=True,
-            factor=sens["factor"],
-            data_type=sens["type"]
-        )
-        entity = SolarMaxSensor(hub, device_info, sensor)
-        entities.append(entity)
-        key_dict[offset] = {"key": sensor_key, "type": sens["type"], "factor": sens["factor"]}
-        offset += 1
-        if str(sens["type"]).endswith("32"):
-            offset += 1
-        elif str(sens["type"]).endswith("64"):
-            offset += 3
-
-    offset += 14 # skip 14 regs
-
-    for sens in power_sensors:
-    # {"name": "Voltage",   "type": "uint16", "factor":  0.1,
-    #  "unit": UnitOfElectricPotential.VOLT, "device_class": SensorDeviceClass.VOLTAGE,
-    #  "state_class": SensorStateClass.MEASUREMENT, "icon": "mdi:sine-wave"},
-        sensor_key = sens["name"].replace(" ", "_")
-        sensor = SolarMaxSensorEntityDescription(
-            name=sens["name"],
-            key=sensor_key,
-            native_unit_of_measurement=sens["unit"],
-            icon=sens["icon"],
-            device_class=sens["device_class"],
-            state_class=sens["state_class"],
-            entity_registry_enabled_default=True,
-            factor=sens["factor"],
-            data_type=sens["type"]
-        )
-        entity = SolarMaxSensor(hub, device_info, sensor)
-        entities.append(entity)
-        key_dict[offset] = {"key": sensor_key, "type": sens["type"], "factor": sens["factor"]}
-        offset += 1
-        if str(sens["type"]).endswith("32"):
-            offset += 1
-        elif str(sens["type"]).endswith("64"):
-            offset += 3
+]
+
 
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Set up SolarMax sensors from a config entry."""
+    hub: SolarMaxModbusHub = hass.data[DOMAIN][entry.entry_id]["hub"]
+    device_info = hass.data[DOMAIN][entry.entry_id]["device_info"]
+    descriptions, key_dict = build_register_map(hub.inverter_type or DEFAULT_INVERTER_TYPE)
+    entities = [SolarMaxSensor(hub, device_info, description) for description in (*descriptions, *DERIVED_SENSORS)]
+    entities += [SolarMaxDiagnosticSensor(hub, device_info, description) for description in DIAGNOSTIC_SENSORS]
     async_add_entities(entities)
     hub.set_key_dict(key_dict)
     _LOGGER.info(f"Added {len(entities)} SolarMax sensors")
 
+
+@cache
+def build_register_map(
+    inverter_type: str = DEFAULT_INVERTER_TYPE,
+) -> tuple[tuple[SolarMaxSensorEntityDescription, ...], Mapping[int, Mapping[str, Any]]]:
+    """Compile the register map of an inverter type into sensor descriptions and the offset index.
+
+    Compiled once per process, all entries of the type share the read-only result.
+    """
+    descriptions = []
+    key_dict = {}
+    for section in REGISTER_MAPS[inverter_type]:
+        offset = section["offset"]
+        for prefix in section.get("prefixes", ("",)):
+            for sens in section["sensors"]:
+                sensor = SolarMaxSensorEntityDescription(
+                    name=f"{prefix} {sens['name']}".strip(),
+                    key=prefix + sens.get("key", sens["name"].replace(" ", "_")),
+                    native_unit_of_measurement=sens.get("unit"),
+                    icon=sens["icon"],
+                    device_class=sens.get("device_class"),
+                    state_class=sens.get("state_class"),
+                    entity_registry_enabled_default=True,
+                    factor=sens["factor"],
+                    position=offset,
+                    data_type=sens["type"],
+                    deadband=sens.get("deadband", 0),
+                    deadband_relative=sens.get("deadband_relative", 0),
+                    poll_group=sens.get("poll_group", POLL_GROUP_SLOW),
+                )
+                descriptions.append(sensor)
+                key_dict[offset] = MappingProxyType({
+                    "key": sensor.key, "type": sensor.data_type, "factor": sensor.factor,
+                    "deadband": sensor.deadband, "deadband_relative": sensor.deadband_relative,
+                    "poll_group": sensor.poll_group,
+                })
+                offset += register_length(sensor.data_type)
+    return tuple(descriptions), MappingProxyType(key_dict)
+
 class SolarMaxSensor(CoordinatorEntity, SensorEntity):
     """Representation of an SolarMax Modbus sensor."""
 
@@ -184,6 +163,7 @@ class SolarMaxSensor(CoordinatorEntity, SensorEntity):
         self._attr_has_entity_name = True
         self._attr_entity_registry_enabled_default = description.entity_registry_enabled_default
         self._attr_force_update = description.force_update
+        self._last_available: bool | None = None
 
     @property
     def native_value(self):
@@ -202,6 +182,15 @@ class SolarMaxSensor(CoordinatorEntity, SensorEntity):
             _LOGGER.debug(f"No data for sensor {self._attr_name}")
         return value
 
+    @property
+    def extra_state_attributes(self):
+        """Return min/max of the samples behind an aggregated value, flag values not read in time."""
+        key = self.entity_description.key
+        attributes = self.coordinator.aggregates.get(key)
+        if key in self.coordinator.stale_keys:
+            return {**(attributes or {}), "stale": True}
+        return attributes
+
     @property
     def available(self) -> bool:
         """Return if entity is available."""
@@ -209,11 +198,81 @@ class SolarMaxSensor(CoordinatorEntity, SensorEntity):
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
+        """Handle updated data from the coordinator, write state only if it changed."""
+        available = self.available
+        if available == self._last_available and self.entity_description.key not in self.coordinator.changed_keys:
+            return
+        self._last_available = available
         self.async_write_ha_state()
 
     async def async_added_to_hass(self) -> None:
         """Run when entity about to be added to hass."""
         await super().async_added_to_hass()
+        self.coordinator.enable_key(self.entity_description.key)
 
         # _LOGGER.debug(f"Sensor {self._attr_name} added to Home Assistant")
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Run when entity will be removed from hass."""
+        self.coordinator.disable_key(self.entity_description.key)
+        await super().async_will_remove_from_hass()
+
+
+class SolarMaxDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Poll cycle statistics of a SolarMax Modbus hub: p95 in ms, p50/max as attributes."""
+
+    # the rolling statistics change every poll, the recorder keeps only the state
+    _unrecorded_attributes = frozenset({"p50", "p95", "max", "samples", *POLL_PHASES})
+
+    def __init__(self, hub: SolarMaxModbusHub, device_info: dict, description: SolarMaxDiagnosticSensorEntityDescription):
+        """Initialize the sensor."""
+        super().__init__(coordinator=hub)
+        self.entity_description = description
+        self._attr_device_info = device_info
+        device_name = device_info.get("name", "SolarMax")
+        self._attr_unique_id = f"{device_name}_{description.key}"
+        self._attr_name = description.name
+        self._attr_has_entity_name = True
+        self._written_value: float | int | None = None
+        self._written_at = 0.0
+
+    @property
+    def native_value(self):
+        """Return the p95 duration of the phase, or the number of failed polls."""
+        stats = self.coordinator.poll_stats
+        if self.entity_description.failures:
+            return stats.failures["total"]
+        return stats.phases[self.entity_description.phase].summary()["p95"]
+
+    @property
+    def extra_state_attributes(self):
+        """Return the rolling statistics."""
+        stats = self.coordinator.poll_stats
+        if self.entity_description.failures:
+            return dict(stats.failures)
+        return stats.phases[self.entity_description.phase].summary()
+
+    @property
+    def available(self) -> bool:
+        """Statistics are available even if the last poll failed."""
+        return True
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state when the value moved past the deadband, smaller changes at most once per interval."""
+        value = self.native_value
+        old = self._written_value
+        if value == old:
+            return
+        now = time.monotonic()
+        if (
+            not self.entity_description.failures
+            and value is not None
+            and old is not None
+            and abs(value - old) <= POLL_STATS_DEADBAND_RELATIVE * abs(old)
+            and now - self._written_at < POLL_STATS_WRITE_INTERVAL
+        ):
+            return
+        self._written_value = value
+        self._written_at = now
+        self.async_write_ha_state()
@@ -0,0 +1,34 @@
+"""Spread the polls of several hubs over the poll interval."""
+
+from __future__ import annotations
+
+import ipaddress
+
+from .const import TRANSPORT_SERIAL
+
+
+def link_group(host: str, transport: str) -> str:
+    """Return the group of hubs whose polls load the same network or bus.
+
+    That is the /24 (IPv4) or /64 (IPv6) subnet of the gateway, the serial
+    device, or the host name if it is not an address.
+    """
+    if transport == TRANSPORT_SERIAL:
+        return host
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return host
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def choose_phase(phases: list[float]) -> float:
+    """Return a poll phase (fraction of the interval) in the middle of the largest gap between phases."""
+    if not phases:
+        return 0.0
+    ordered = sorted(phase % 1 for phase in phases)
+    gaps = [(b - a, a) for a, b in zip(ordered, ordered[1:])]
+    gaps.append((ordered[0] + 1 - ordered[-1], ordered[-1]))
+    width, start = max(gaps)
+    return round((start + width / 2) % 1, 4)
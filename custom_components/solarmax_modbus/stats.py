@@ -0,0 +1,123 @@
+"""Rolling timing statistics of the poll cycle phases."""
+
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+import time
+
+from .const import AGGREGATE_MAX_SAMPLES, POLL_STATS_WINDOW
+
+# phases of a poll cycle, in order
+POLL_PHASES = ("ping", "connect", "read", "decode", "fanout", "total")
+
+
+class RollingStats:
+    """Durations of the last window samples of one phase."""
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, window: int = POLL_STATS_WINDOW) -> None:
+        """Initialize the window."""
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        """Add a sample."""
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        """Return the pct percentile in seconds, None without samples."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> dict[str, float | int | None]:
+        """Return p50/p95/max in milliseconds and the sample count."""
+        if not self._samples:
+            return {"p50": None, "p95": None, "max": None, "samples": 0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "p50": round(ordered[min(last, len(ordered) // 2)] * 1000, 1),
+            "p95": round(ordered[min(last, int(len(ordered) * 0.95))] * 1000, 1),
+            "max": round(ordered[last] * 1000, 1),
+            "samples": len(ordered),
+        }
+
+
+class PollStats:
+    """Per-phase timings and failure counters of one hub."""
+
+    def __init__(self, window: int = POLL_STATS_WINDOW) -> None:
+        """Initialize the statistics."""
+        self.phases = {phase: RollingStats(window) for phase in POLL_PHASES}
+        self.failures = {phase: 0 for phase in POLL_PHASES}
+        self.polls = 0
+        # durations of the running cycle, phases timed more than once are summed
+        self.cycle: dict[str, float] = {}
+
+    def start_cycle(self) -> None:
+        """Start a new poll cycle."""
+        self.polls += 1
+        self.cycle = {}
+
+    @contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        """Time the enclosed code as phase, count it as failure if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failures[phase] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[phase].add(elapsed)
+            self.cycle[phase] = self.cycle.get(phase, 0.0) + elapsed
+
+    def as_dict(self) -> dict[str, dict]:
+        """Return all statistics."""
+        return {
+            "polls": self.polls,
+            "phases": {phase: stats.summary() for phase, stats in self.phases.items()},
+            "failures": dict(self.failures),
+        }
+
+
+class SampleWindow:
+    """Array-backed window of the samples of one value between two publishes."""
+
+    __slots__ = ("_values", "_pos", "_count")
+
+    def __init__(self, capacity: int = AGGREGATE_MAX_SAMPLES) -> None:
+        """Allocate the window, the oldest samples are overwritten when it is full."""
+        self._values = array("d", bytes(8 * capacity))
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return self._count
+
+    def add(self, value: float) -> None:
+        """Add a sample."""
+        self._values[self._pos] = value
+        self._pos = (self._pos + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def summary(self) -> tuple[float, float, float]:
+        """Return mean, min and max of the samples."""
+        values = self._values if self._count == len(self._values) else self._values[:self._count]
+        return sum(values) / self._count, min(values), max(values)
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        self._pos = 0
+        self._count = 0
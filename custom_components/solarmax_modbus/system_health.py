@@ -4,7 +4,6 @@ from typing import Any
 
 from homeassistant.components import system_health
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.config_entries import ConfigEntry
 from .const import DOMAIN
 
 @callback
@@ -14,14 +13,18 @@ def async_register(hass: HomeAssistant, register: system_health.SystemHealthRegi
 
 async def system_health_info(hass: HomeAssistant) -> dict[str, Any]:
     """Get info for the info page."""
-    config_entry: ConfigEntry = hass.config_entries.async_entries(DOMAIN)[0]
-    #quota_info = await config_entry.runtime_data.async_get_quota_info()
-
-    return {
-        "state": "up",
-        "data": f"{config_entry.data}",
-        #"consumed_requests": quota_info.consumed_requests,
-        #"remaining_requests": quota_info.requests_remaining,
-        # checking the url can take a while, so set the coroutine in the info dict
-        #"can_reach_server": system_health.async_check_can_reach_url(hass, ENDPOINT),
-    }
+    info: dict[str, Any] = {"state": "up"}
+    for config_entry in hass.config_entries.async_entries(DOMAIN):
+        hub = hass.data.get(DOMAIN, {}).get(config_entry.entry_id, {}).get("hub")
+        if hub is None:
+            info[config_entry.title] = f"not loaded, {config_entry.data}"
+            continue
+        stats = hub.poll_stats.as_dict()
+        total = stats["phases"]["total"]
+        read = stats["phases"]["read"]
+        info[config_entry.title] = (
+            f"{'ok' if hub.last_update_success else 'failing'}, {stats['polls']} polls, "
+            f"poll p50/p95/max {total['p50']}/{total['p95']}/{total['max']} ms, "
+            f"read p95 {read['p95']} ms, failures {stats['failures']}"
+        )
+    return info
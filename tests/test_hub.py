@@ -0,0 +1,136 @@
+"""Tests of the block read bisection of SolarMaxModbusHub.
+
+Run with pytest and pytest-homeassistant-custom-component installed.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from custom_components.solarmax_modbus.connection import ModbusConnection
+from custom_components.solarmax_modbus.const import DOMAIN, ILLEGAL_DATA_ADDRESS, REGISTER_BASE_ADDRESS
+from custom_components.solarmax_modbus.hub import SolarMaxModbusHub
+from custom_components.solarmax_modbus.sensor import build_register_map
+
+# what a gateway answers for an inverter that sleeps at night
+GATEWAY_TARGET_NO_RESPONSE = 0x0B
+
+# register offsets the fake inverter rejects: L2 Voltage and a reserved register
+REJECTED_REGISTERS = (5, 30)
+
+
+class FakeResponse:
+    """Register response or Modbus exception response."""
+
+    def __init__(self, registers: list[int], exception_code: int | None = None) -> None:
+        self.registers = registers
+        self.exception_code = exception_code
+
+    def isError(self) -> bool:
+        return self.exception_code is not None
+
+
+def _rejecting(registers, code=ILLEGAL_DATA_ADDRESS):
+    """Answer reads spanning one of registers with the exception code."""
+    def answer(start: int, count: int, request: int) -> int | None:
+        return code if any(start <= register < start + count for register in registers) else None
+    return answer
+
+
+def _create_hub(hass, answer) -> SolarMaxModbusHub:
+    """Create a hub reading every sensor from a fake connection.
+
+    answer(start, count, request number) returns the exception code of the
+    read or None for a normal response. Requests are numbered from 1 over
+    the life of the hub, not per poll.
+    """
+    # registered before the hub picks it up, its connection task never starts
+    connection = ModbusConnection(hass, "127.0.0.1", 502)
+    hass.data.setdefault(DOMAIN, {}).setdefault("connections", {})[connection.key] = connection
+    request_count = 0
+
+    async def read(address, count, unit_id, timeout=None, low_priority=False):
+        nonlocal request_count
+        request_count += 1
+        start = address - REGISTER_BASE_ADDRESS
+        hub.requests.append((start, count))
+        code = answer(start, count, request_count)
+        return FakeResponse([1] * count if code is None else [], code), 0.01
+
+    async def connect():
+        pass
+
+    connection.read_holding_registers_timed = read
+    connection.async_connect = connect
+    hub = SolarMaxModbusHub(hass, "test", "127.0.0.1", 502, 60, None)
+    hub.requests = []
+    descriptions, key_dict = build_register_map()
+    for description in descriptions:
+        hub.enable_key(description.key)
+    hub.set_key_dict(key_dict)
+    return hub
+
+
+async def _poll(hub: SolarMaxModbusHub) -> dict:
+    """Run one poll cycle with every group due."""
+    hub.requests.clear()
+    hub._group_next_due.clear()
+    hub._cycle_deadline = time.monotonic() + 10
+    return dict(await hub._async_read_due_groups())
+
+
+async def test_rejected_registers_are_read_around(hass) -> None:
+    """A rejected sensor and a rejected gap are excluded, the other values are read."""
+    hub = _create_hub(hass, _rejecting(REJECTED_REGISTERS))
+    data = await _poll(hub)
+    assert hub.excluded_ranges == {(5, 6), (29, 32)}
+    assert "L2Voltage" not in data
+    assert "InverterMode" in data
+    assert "L1Voltage" in data
+
+    await _poll(hub)
+    assert all(
+        not (start <= register < start + count)
+        for start, count in hub.requests
+        for register in REJECTED_REGISTERS
+    )
+    assert len(hub.requests) == 3
+
+
+async def test_transient_rejection_excludes_nothing(hass) -> None:
+    """A block rejected once whose halves are read fine leaves the layout alone."""
+    hub = _create_hub(hass, lambda start, count, request: ILLEGAL_DATA_ADDRESS if request == 1 else None)
+    data = await _poll(hub)
+    assert hub.excluded_ranges == set()
+    assert "L2Voltage" in data
+
+    await _poll(hub)
+    assert len(hub.requests) == 1
+
+
+async def test_gateway_exception_is_a_read_failure(hass) -> None:
+    """At night the gateway rejects every read; the block is not bisected."""
+    hub = _create_hub(hass, lambda start, count, request: GATEWAY_TARGET_NO_RESPONSE)
+    with pytest.raises(ConnectionError):
+        await _poll(hub)
+    assert len(hub.requests) == 1
+    assert hub.excluded_ranges == set()
+    assert not hub._plan_dirty
+
+
+async def test_every_register_rejected_excludes_nothing(hass) -> None:
+    """If no part of a block can be read, nothing is learned and the required keys stay in the plan."""
+    hub = _create_hub(hass, lambda start, count, request: ILLEGAL_DATA_ADDRESS)
+    with pytest.raises(ConnectionError):
+        await _poll(hub)
+    assert hub.excluded_ranges == set()
+
+
+async def test_required_key_is_never_excluded(hass) -> None:
+    """A rejected InverterMode fails the read instead of dropping the key."""
+    hub = _create_hub(hass, _rejecting((28,)))
+    with pytest.raises(ConnectionError):
+        await _poll(hub)
+    assert hub.excluded_ranges == set()
@@ -0,0 +1,413 @@
+"""Simulate SolarMax 6SMT inverters behind Modbus TCP gateways.
+
+Serves the measurement block at 4097 and the serial number at 6672 for N
+virtual inverters. The register layout comes from the sensor platform's
+register map, so the simulator always matches what the hub decodes.
+
+Faults can be injected: response latency, dropped connections, Modbus
+exception responses and day/night changes of the inverter mode.
+
+    python tools/simulator.py --port 5020 --gateways 2 --units 3 --latency 0.05 --drop 0.01
+
+runs two gateways on ports 5020 and 5021 with unit ids 1-3 each. With
+--rtu the gateways speak RTU frames over TCP like a transparent RS485
+bridge; --pty serves RTU on pseudo terminals instead, for the serial
+transport. --baudrate adds the transmit time of the frames on a bus of
+that speed. Needs a Home Assistant development environment for the
+register map.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import struct
+import sys
+import time
+import tty
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from custom_components.solarmax_modbus import const  # noqa: E402
+from custom_components.solarmax_modbus.decoder import STRUCT_CODES  # noqa: E402
+from custom_components.solarmax_modbus.sensor import build_register_map  # noqa: E402
+
+_LOGGER = logging.getLogger("solarmax_simulator")
+
+SERIAL_ADDRESS = const.SERIAL_NUMBER_ADDRESS
+SERIAL_COUNT = const.SERIAL_NUMBER_COUNT
+
+FC_READ_HOLDING_REGISTERS = 0x03
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_ILLEGAL_VALUE = 0x03
+EXC_DEVICE_FAILURE = 0x04
+EXC_GATEWAY_NO_RESPONSE = 0x0B
+
+# unit id, function, address, count and CRC of a read holding registers request
+RTU_REQUEST_SIZE = 8
+RTU_CHARACTER_BITS = 11
+
+MODE_CODES = {name: code for code, name in const.STATUS_INVERTER_MODE.items()}
+
+
+@dataclass
+class Faults:
+    """Fault injection settings of a simulated gateway."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    drop: float = 0.0
+    error: float = 0.0
+
+
+@dataclass
+class DayNight:
+    """Day/night cycle of the simulated inverters.
+
+    period 0 keeps the inverters on grid. Otherwise the first day_fraction
+    of every period is day. At night the inverters report Standby, or with
+    night_off the gateway answers "target device failed to respond".
+    """
+
+    period: float = 0.0
+    day_fraction: float = 0.5
+    night_off: bool = False
+
+    def sun(self, now: float) -> float:
+        """Return the sun intensity 0..1 at now."""
+        if self.period <= 0:
+            return 1.0
+        phase = (now % self.period) / (self.period * self.day_fraction)
+        return math.sin(math.pi * phase) if phase < 1 else 0.0
+
+
+@dataclass
+class VirtualInverter:
+    """One simulated inverter with plausible, slowly varying values."""
+
+    unit_id: int
+    serial: str
+    peak_power: float = 6000.0
+    day_night: DayNight = field(default_factory=DayNight)
+    total_energy: float = 20000.0
+    total_hours: float = 9000.0
+    today_energy: float = 0.0
+    today_max: float = 0.0
+    _last: float = field(default_factory=time.monotonic)
+
+    def values(self, now: float) -> dict[str, float | str]:
+        """Return the current values by sensor key."""
+        sun = self.day_night.sun(now)
+        dt = now - self._last
+        self._last = now
+        power = self.peak_power * sun * random.uniform(0.85, 1.0)
+        if power > 0:
+            self.total_energy += power * dt / 3_600_000
+            self.today_energy += power * dt / 3_600_000
+            self.total_hours += dt / 3600
+        self.today_max = max(self.today_max, power)
+        values: dict[str, float | str] = {
+            "Temperature": 20 + 25 * sun,
+            "InverterMode": "OnGrid" if sun > 0 else "Standby",
+            "Total_Energy": self.total_energy,
+            "Total_Hours": self.total_hours,
+            "Today_Energy": self.today_energy,
+            "Today_Energy2": self.today_energy,
+            "Active_Power": power,
+            "Reactive_Power": power * 0.02,
+            "Today_max_Power": self.today_max,
+        }
+        for phase in (1, 2, 3):
+            voltage = random.gauss(230, 1.5)
+            values[f"L{phase}Voltage"] = voltage
+            values[f"L{phase}Current"] = power / 3 / voltage
+            values[f"L{phase}Power"] = power / 3
+            values[f"L{phase}Frequency"] = random.gauss(50, 0.02)
+        strings = (0.52, 0.48, 0.0)
+        for string, share in enumerate(strings, start=1):
+            voltage = 350 * min(1.0, sun * 4) if share else 0.0
+            values[f"PV{string}Voltage"] = voltage
+            values[f"PV{string}Power"] = power * share
+            values[f"PV{string}Current"] = power * share / voltage if voltage else 0.0
+        return values
+
+    def is_awake(self, now: float) -> bool:
+        """Return False while the inverter is switched off for the night."""
+        return not self.day_night.night_off or self.day_night.sun(now) > 0
+
+
+class RegisterEncoder:
+    """Encode sensor values into the measurement block, the inverse of RegisterDecodePlan."""
+
+    def __init__(self, key_dict: dict[int, dict]) -> None:
+        """Compile the layout."""
+        self._fields = []
+        size = 0
+        for offset in sorted(key_dict):
+            entry = key_dict[offset]
+            if entry["type"].startswith("STATUS"):
+                code, length = "H", 1
+            else:
+                code, length = STRUCT_CODES[entry["type"]]
+            self._fields.append((offset, struct.Struct(f">{code}"), entry["key"], entry.get("factor", 1), code))
+            size = max(size, offset + length)
+        self.count = max(size, const.REGISTER_BLOCK_COUNT)
+
+    def encode(self, values: dict[str, float | str]) -> list[int]:
+        """Return the registers for values."""
+        raw = bytearray(2 * self.count)
+        for offset, packer, key, factor, code in self._fields:
+            value = values.get(key, 0)
+            if isinstance(value, str):
+                value = MODE_CODES.get(value, 0)
+            elif code not in "fd":
+                value = max(0, round(value / factor)) if code.isupper() else round(value / factor)
+            packer.pack_into(raw, 2 * offset, value)
+        return list(struct.unpack(f">{self.count}H", raw))
+
+
+def encode_serial(serial: str) -> list[int]:
+    """Encode a serial number, two ASCII characters per register."""
+    raw = serial.encode("ascii")[: 2 * SERIAL_COUNT].ljust(2 * SERIAL_COUNT, b"\0")
+    return list(struct.unpack(f">{SERIAL_COUNT}H", raw))
+
+
+def crc16(data: bytes) -> int:
+    """Return the Modbus RTU CRC of data."""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class Gateway:
+    """A Modbus TCP gateway, RTU bridge or serial bus with several inverters."""
+
+    def __init__(
+        self,
+        inverters: list[VirtualInverter],
+        encoder: RegisterEncoder,
+        faults: Faults,
+        rtu: bool = False,
+        baudrate: int = 0,
+    ) -> None:
+        """Initialize the gateway, baudrate 0 transmits frames without delay."""
+        self.inverters = {inverter.unit_id: inverter for inverter in inverters}
+        self.encoder = encoder
+        self.faults = faults
+        self.rtu = rtu
+        self.baudrate = baudrate
+        self.requests = 0
+        self.device: str | None = None
+        self._server: asyncio.Server | None = None
+        self._pty_task: asyncio.Task | None = None
+        self._pty_transport: asyncio.ReadTransport | None = None
+        self._pty_fds: tuple[int, ...] = ()
+
+    async def start(self, host: str, port: int) -> None:
+        """Listen on host:port."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+
+    async def start_pty(self) -> str:
+        """Serve RTU on a new pseudo terminal, return the device path for the client."""
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        self._pty_fds = (master, slave)
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        self._pty_transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(os.dup(master), "rb", buffering=0)
+        )
+        self.rtu = True
+        self.device = os.ttyname(slave)
+        self._pty_task = loop.create_task(self._serve_rtu(reader, lambda data: os.write(master, data)))
+        return self.device
+
+    def close(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+        if self._pty_task is not None:
+            self._pty_task.cancel()
+            self._pty_transport.close()
+            for fd in self._pty_fds:
+                os.close(fd)
+            self._pty_fds = ()
+            self._pty_task = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one client connection."""
+        if self.rtu:
+            try:
+                await self._serve_rtu(reader, writer.write)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+            return
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                tid, pid, length, unit_id = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+                if random.random() < self.faults.drop:
+                    _LOGGER.debug("dropping connection")
+                    break
+                if self.faults.latency or self.faults.jitter:
+                    await asyncio.sleep(self.faults.latency + random.uniform(0, self.faults.jitter))
+                response = self.handle_pdu(unit_id, pdu)
+                if response is None:
+                    continue
+                writer.write(struct.pack(">HHHB", tid, pid, len(response) + 1, unit_id) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_rtu(self, reader: asyncio.StreamReader, write) -> None:
+        """Serve RTU frames, requests with a bad CRC or dropped ones get no answer."""
+        while True:
+            frame = await reader.readexactly(RTU_REQUEST_SIZE)
+            self.requests += 1
+            if crc16(frame[:-2]) != struct.unpack("<H", frame[-2:])[0]:
+                _LOGGER.debug(f"ignoring frame with bad CRC {frame.hex()}")
+                continue
+            if random.random() < self.faults.drop:
+                _LOGGER.debug("dropping request")
+                continue
+            if self.faults.latency or self.faults.jitter:
+                await asyncio.sleep(self.faults.latency + random.uniform(0, self.faults.jitter))
+            unit_id = frame[0]
+            response = self.handle_pdu(unit_id, frame[1:-2])
+            if response is None:
+                continue
+            body = bytes((unit_id,)) + response
+            if self.baudrate:
+                # request and response share the half duplex bus
+                await asyncio.sleep((len(frame) + len(body) + 2) * RTU_CHARACTER_BITS / self.baudrate)
+            write(body + struct.pack("<H", crc16(body)))
+
+    def handle_pdu(self, unit_id: int, pdu: bytes) -> bytes | None:
+        """Answer one request PDU, None for no answer at all."""
+        function = pdu[0]
+        inverter = self.inverters.get(unit_id)
+        now = time.monotonic()
+        if inverter is None or not inverter.is_awake(now):
+            return bytes((function | 0x80, EXC_GATEWAY_NO_RESPONSE))
+        if function != FC_READ_HOLDING_REGISTERS:
+            return bytes((function | 0x80, EXC_ILLEGAL_FUNCTION))
+        address, count = struct.unpack(">HH", pdu[1:5])
+        if not 1 <= count <= 125:
+            return bytes((function | 0x80, EXC_ILLEGAL_VALUE))
+        if random.random() < self.faults.error:
+            return bytes((function | 0x80, EXC_DEVICE_FAILURE))
+        registers = self.read(inverter, address, count, now)
+        if registers is None:
+            return bytes((function | 0x80, EXC_ILLEGAL_ADDRESS))
+        return struct.pack(f">BB{count}H", function, 2 * count, *registers)
+
+    def read(self, inverter: VirtualInverter, address: int, count: int, now: float) -> list[int] | None:
+        """Return count registers at address, None for an unmapped range."""
+        block_start = const.REGISTER_BASE_ADDRESS
+        if block_start <= address and address + count <= block_start + self.encoder.count:
+            registers = self.encoder.encode(inverter.values(now))
+            return registers[address - block_start:address - block_start + count]
+        if SERIAL_ADDRESS <= address and address + count <= SERIAL_ADDRESS + SERIAL_COUNT:
+            registers = encode_serial(inverter.serial)
+            return registers[address - SERIAL_ADDRESS:address - SERIAL_ADDRESS + count]
+        return None
+
+
+async def start_simulator(
+    host: str = "127.0.0.1",
+    port: int = 5020,
+    gateways: int = 1,
+    units: int = 1,
+    faults: Faults | None = None,
+    day_night: DayNight | None = None,
+    rtu: bool = False,
+    pty: bool = False,
+    baudrate: int = 0,
+) -> list[Gateway]:
+    """Start gateways on consecutive ports or on pseudo terminals, each with units inverters (unit ids 1..units)."""
+    _, key_dict = build_register_map()
+    encoder = RegisterEncoder(key_dict)
+    started = []
+    for index in range(gateways):
+        inverters = [
+            VirtualInverter(
+                unit_id=unit,
+                serial=f"2245-{211300000 + index * 1000 + unit}",
+                day_night=day_night or DayNight(),
+            )
+            for unit in range(1, units + 1)
+        ]
+        gateway = Gateway(inverters, encoder, faults or Faults(), rtu, baudrate)
+        if pty:
+            await gateway.start_pty()
+        else:
+            await gateway.start(host, port + index)
+        started.append(gateway)
+    return started
+
+
+async def _main(args: argparse.Namespace) -> None:
+    gateways = await start_simulator(
+        args.host,
+        args.port,
+        args.gateways,
+        args.units,
+        Faults(args.latency, args.jitter, args.drop, args.error),
+        DayNight(args.day_period, args.day_fraction, args.night_off),
+        args.rtu,
+        args.pty,
+        args.baudrate,
+    )
+    if args.pty:
+        for gateway in gateways:
+            _LOGGER.info(f"serving {args.units} inverter(s) on {gateway.device}")
+    else:
+        _LOGGER.info(f"serving {args.gateways} gateway(s) x {args.units} inverter(s) from port {args.port}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            _LOGGER.info(f"requests served: {sum(g.requests for g in gateways)}")
+    finally:
+        for gateway in gateways:
+            gateway.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020, help="port of the first gateway")
+    parser.add_argument("--gateways", type=int, default=1, help="gateways on consecutive ports")
+    parser.add_argument("--units", type=int, default=1, help="inverters per gateway")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency in seconds")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability to drop the connection per request")
+    parser.add_argument("--error", type=float, default=0.0, help="probability of a device failure response")
+    parser.add_argument("--day-period", type=float, default=0.0, help="length of a simulated day in seconds, 0 = always day")
+    parser.add_argument("--day-fraction", type=float, default=0.5, help="part of the day period with sun")
+    parser.add_argument("--night-off", action="store_true", help="inverters are switched off at night")
+    parser.add_argument("--rtu", action="store_true", help="RTU frames over TCP, like a transparent RS485 bridge")
+    parser.add_argument("--pty", action="store_true", help="serve RTU on pseudo terminals instead of TCP ports")
+    parser.add_argument("--baudrate", type=int, default=0, help="simulated bus speed for RTU, 0 = no transmit time")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    cli_args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if cli_args.verbose else logging.INFO)
+    try:
+        asyncio.run(_main(cli_args))
+    except KeyboardInterrupt:
+        pass